@@ -5,12 +5,15 @@ Abstract base class for all agents in the multi-agent system
 
 import asyncio
 import logging
+import time
 from abc import ABC, abstractmethod
-from datetime import datetime
-from typing import Dict, Any, Optional, List
+from collections import deque
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Set
 from enum import Enum
 
-from core.message_broker import message_broker, MessageType, MessagePriority, Message
+from core.message_broker import message_broker, MessageType, MessagePriority, Message, AGENT_STATUS_TOPIC
 from core.database import db_manager, get_db_session
 
 
@@ -23,35 +26,127 @@ class AgentStatus(Enum):
     STOPPED = "stopped"
 
 
+# Hoisted for the run loop's per-iteration status check
+RUNNING = AgentStatus.RUNNING
+
+
+@dataclass(slots=True)
+class AgentStats:
+    """Agent performance counters"""
+    start_time: Optional[datetime] = None
+    messages_sent: int = 0
+    messages_received: int = 0
+    tasks_completed: int = 0
+    errors_encountered: int = 0
+    last_activity: Optional[datetime] = None
+
+
+class _Batcher:
+    """Collects queue items into batches bounded by size and wait time"""
+    
+    def __init__(self, max_size: int, max_wait: float):
+        self.max_size = max_size
+        self.max_wait = max_wait
+    
+    async def collect(self, queue: asyncio.Queue, timeout: float) -> List[Any]:
+        """Wait up to timeout for a first item, then up to max_wait for more"""
+        batch = []
+        
+        if queue.empty():
+            if timeout <= 0:
+                return batch
+            try:
+                async with asyncio.timeout(timeout):
+                    batch.append(await queue.get())
+            except TimeoutError:
+                return batch
+        
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        
+        # One deadline for the whole fill instead of a fresh timeout around every awaited item
+        try:
+            async with asyncio.timeout_at(deadline):
+                while len(batch) < self.max_size:
+                    if queue.empty():
+                        batch.append(await queue.get())
+                    else:
+                        batch.append(queue.get_nowait())
+        except TimeoutError:
+            pass
+        
+        return batch
+
+
 class BaseAgent(ABC):
     """Abstract base class for all EcoSmart AI agents"""
     
+    # Default priority for outgoing messages
+    DEFAULT_PRIORITY = MessagePriority.MEDIUM
+    
+    # Per-class logger, resolved once in __init_subclass__
+    _class_logger = logging.getLogger("BaseAgent")
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._class_logger = logging.getLogger(cls.__name__)
+        cls._class_logger.setLevel(logging.INFO)
+    
     def __init__(self, agent_name: str, description: str = ""):
         self.agent_name = agent_name
         self.description = description
         self.status = AgentStatus.STARTING
-        self.last_heartbeat = datetime.utcnow()
+        
+        # Internal timestamps are monotonic floats; wall-clock values are
+        # derived from this anchor only when status is reported
+        self._wall_anchor = datetime.utcnow()
+        self._mono_anchor = time.monotonic()
+        self._start_mono: Optional[float] = None
+        self._last_heartbeat_mono = self._mono_anchor
+        self._last_activity_mono: Optional[float] = None
+        
+        # Short-lived get_status() cache, invalidated on state changes
+        self.status_cache_ttl = 0.25
+        self._status_cache: Optional[Dict[str, Any]] = None
+        self._status_cache_deadline = 0.0
+        self._capabilities: tuple = ()
+        
+        # Buffered decision logging (flushed to the database in batches)
+        self.decision_flush_interval = 1.0
+        self._decision_buffer: deque = deque(maxlen=10000)
         self.error_count = 0
         self.max_errors = 5
         
+        # Message batching (size cap and how long to linger for more messages)
+        self.max_batch_size = 256
+        self.batch_max_wait = 0.05
+        
+        # Prefetch buffer between broker polling and message handling
+        self.inbox_size = 1024
+        self.prefetch_idle_interval = 0.5
+        self._inbox: Optional[asyncio.Queue] = None
+        self._batcher: Optional[_Batcher] = None
+        
         # Agent lifecycle
         self._running = False
-        self._task = None
-        self._heartbeat_task = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._hb_handle: Optional[asyncio.TimerHandle] = None
+        self._interval = 0.0
+        
+        # Adaptive heartbeat: faster while busy, slower while idle. The
+        # ceiling stays well under the 2 minute is_healthy() window.
+        self.heartbeat_min_interval = 5.0
+        self.heartbeat_max_interval = 60.0
+        self.heartbeat_busy_threshold = 10
+        self._hb_interval = 30.0
+        self._hb_last_activity = 0
         
         # Performance metrics
-        self.stats = {
-            'start_time': None,
-            'messages_sent': 0,
-            'messages_received': 0,
-            'tasks_completed': 0,
-            'errors_encountered': 0,
-            'last_activity': None
-        }
+        self.stats = AgentStats()
         
-        # Setup logging
-        self.logger = logging.getLogger(f"{self.__class__.__name__}")
-        self.logger.setLevel(logging.INFO)
+        # Setup logging (debug level is cached for hot paths, refreshed on heartbeat)
+        self.logger = self._class_logger
+        self._log_debug = self.logger.debug
+        self._debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
         
         self.logger.info(f"Agent {self.agent_name} initialized")
     
@@ -60,13 +155,16 @@ class BaseAgent(ABC):
         try:
             self.logger.info(f"Starting agent {self.agent_name}")
             
+            # Capabilities are fixed per agent, snapshot them once
+            self._capabilities = tuple(self.get_capabilities())
+            
             # Register with message broker
             success = message_broker.register_agent(
                 self.agent_name, 
                 {
                     'description': self.description,
                     'class': self.__class__.__name__,
-                    'capabilities': self.get_capabilities()
+                    'capabilities': list(self._capabilities)
                 }
             )
             
@@ -79,17 +177,28 @@ class BaseAgent(ABC):
             # Start main execution loop
             self._running = True
             self.status = AgentStatus.RUNNING
-            self.stats['start_time'] = datetime.utcnow()
+            self._wall_anchor = datetime.utcnow()
+            self._mono_anchor = self._start_mono = time.monotonic()
+            self.stats.start_time = self._wall_anchor
+            
+            # Execution interval is fixed per agent, resolve it once
+            self._interval = self.get_execution_interval()
+            self._on_state_change()
             
             # Start background tasks
-            self._task = asyncio.create_task(self._run_loop())
-            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+            self._inbox = asyncio.Queue(maxsize=self.inbox_size)
+            self._batcher = _Batcher(self.max_batch_size, self.batch_max_wait)
+            self._spawn(self._prefetch_loop())
+            self._spawn(self._run_loop())
+            self._spawn(self._decision_flush_loop())
+            self._schedule_heartbeat(0)
             
             self.logger.info(f"Agent {self.agent_name} started successfully")
             
         except Exception as e:
             self.logger.error(f"Failed to start agent {self.agent_name}: {e}")
             self.status = AgentStatus.ERROR
+            self._on_state_change()
             raise
     
     async def stop(self):
@@ -98,16 +207,22 @@ class BaseAgent(ABC):
         
         self._running = False
         self.status = AgentStatus.STOPPED
+        self._on_state_change()
         
-        # Cancel background tasks
-        if self._task:
-            self._task.cancel()
-        if self._heartbeat_task:
-            self._heartbeat_task.cancel()
+        # Cancel background tasks (the calling task exits on its own via _running)
+        if self._hb_handle:
+            self._hb_handle.cancel()
+        current = asyncio.current_task()
+        for task in list(self._tasks):
+            if task is not current:
+                task.cancel()
         
         # Cleanup agent-specific resources
         await self.cleanup()
         
+        # Write out any decisions still buffered
+        await self._flush_decisions()
+        
         # Unregister from message broker
         message_broker.unregister_agent(self.agent_name)
         
@@ -117,61 +232,142 @@ class BaseAgent(ABC):
         """Pause agent execution"""
         self.logger.info(f"Pausing agent {self.agent_name}")
         self.status = AgentStatus.PAUSED
+        self._on_state_change()
     
     async def resume(self):
         """Resume agent execution"""
         self.logger.info(f"Resuming agent {self.agent_name}")
         self.status = AgentStatus.RUNNING
+        self._on_state_change()
+    
+    def _spawn(self, coro) -> asyncio.Task:
+        """Create a background task and keep a reference until it finishes"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
     
     async def _run_loop(self):
         """Main agent execution loop"""
+        loop = asyncio.get_running_loop()
+        next_cycle = loop.time()
+        batch = []
+        
+        # Message processing handles its own errors, only the agent cycle
+        # can feed the error counter
         while self._running:
-            try:
-                if self.status == AgentStatus.RUNNING:
-                    # Process incoming messages
-                    await self._process_messages()
-                    
+            if self.status is not RUNNING:
+                await asyncio.sleep(self._interval)
+                continue
+            
+            # Process incoming messages
+            if batch:
+                await self._process_messages(batch)
+                batch = []
+            
+            if loop.time() >= next_cycle:
+                try:
                     # Execute agent-specific logic
                     await self.execute_cycle()
-                    
+                except Exception as e:
+                    await self._handle_error(e)
+                else:
                     # Update activity timestamp
-                    self.stats['last_activity'] = datetime.utcnow()
-                    self.stats['tasks_completed'] += 1
-                
-                # Sleep based on agent's execution interval
-                await asyncio.sleep(self.get_execution_interval())
+                    self._last_activity_mono = time.monotonic()
+                    self.stats.tasks_completed += 1
                 
-            except Exception as e:
-                await self._handle_error(e)
+                next_cycle = loop.time() + self._interval
+            
+            # Sleep until the next cycle, waking early to batch up arriving messages
+            batch = await self._batcher.collect(self._inbox, next_cycle - loop.time())
+    
+    def _schedule_heartbeat(self, delay: float):
+        """Schedule the next heartbeat tick on the event loop timer heap"""
+        loop = asyncio.get_running_loop()
+        self._hb_handle = loop.call_later(delay, self._heartbeat_tick)
     
-    async def _heartbeat_loop(self):
-        """Send periodic heartbeats to message broker"""
+    def _heartbeat_tick(self):
+        """Timer callback: send the heartbeat in a tracked task"""
+        if self._running:
+            self._spawn(self._heartbeat())
+    
+    async def _heartbeat(self):
+        """Send a heartbeat to message broker and schedule the next one"""
+        try:
+            await message_broker.send_heartbeat(self.agent_name)
+            self._last_heartbeat_mono = time.monotonic()
+            
+            activity = self._activity_count()
+            self._adapt_heartbeat_interval(activity - self._hb_last_activity)
+            self._hb_last_activity = activity
+            
+            # Pick up runtime log level changes
+            self._debug_enabled = self.logger.isEnabledFor(logging.DEBUG)
+            
+        except Exception as e:
+            self.logger.error(f"Heartbeat error: {e}")
+        
+        if self._running:
+            self._schedule_heartbeat(self._hb_interval)
+    
+    def _activity_count(self) -> int:
+        """Total units of work done so far (cycles and received messages)"""
+        return self.stats.tasks_completed + self.stats.messages_received
+    
+    def _adapt_heartbeat_interval(self, activity_delta: int):
+        """Halve the heartbeat interval when busy, back off by 1.5x when idle"""
+        if activity_delta >= self.heartbeat_busy_threshold:
+            self._hb_interval = max(self.heartbeat_min_interval, self._hb_interval / 2)
+        elif activity_delta == 0:
+            self._hb_interval = min(self.heartbeat_max_interval, self._hb_interval * 1.5)
+    
+    async def _prefetch_loop(self):
+        """Poll the message broker and buffer messages into the inbox"""
         while self._running:
             try:
-                await message_broker.send_heartbeat(self.agent_name)
-                self.last_heartbeat = datetime.utcnow()
-                await asyncio.sleep(30)  # Heartbeat every 30 seconds
+                messages = await message_broker.receive_messages(
+                    self.agent_name, max_messages=self.max_batch_size
+                )
+                
+                if not messages:
+                    await asyncio.sleep(self.prefetch_idle_interval)
+                    continue
                 
+                # Blocks when the inbox is full (backpressure on the broker queue)
+                for message in messages:
+                    await self._inbox.put(message)
+                    
             except Exception as e:
-                self.logger.error(f"Heartbeat error: {e}")
+                self.logger.error(f"Prefetch error: {e}")
                 await asyncio.sleep(5)
     
-    async def _process_messages(self):
-        """Process incoming messages from message broker"""
+    async def _process_messages(self, messages: List[Message]):
+        """Process a batch of prefetched messages"""
+        self.stats.messages_received += len(messages)
         try:
-            messages = await message_broker.receive_messages(self.agent_name, max_messages=10)
-            
-            for message in messages:
-                self.stats['messages_received'] += 1
-                await self.handle_message(message)
-                
+            await self.handle_messages_batch(messages)
         except Exception as e:
             self.logger.error(f"Error processing messages: {e}")
     
+    async def handle_messages_batch(self, messages: List[Message]):
+        """Handle a batch of messages (override for batch-aware processing)"""
+        results = await asyncio.gather(
+            *(self.handle_message(message) for message in messages),
+            return_exceptions=True
+        )
+        
+        if self._debug_enabled:
+            self._log_debug("Handled batch of %d messages", len(messages))
+        
+        for message, result in zip(messages, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"Error handling message {message.id}: {result}")
+    
     async def _handle_error(self, error: Exception):
         """Handle errors during agent execution"""
         self.error_count += 1
-        self.stats['errors_encountered'] += 1
+        self.stats.errors_encountered += 1
+        self._on_state_change()
         
         self.logger.error(f"Agent {self.agent_name} error #{self.error_count}: {error}")
         
@@ -187,19 +383,25 @@ class BaseAgent(ABC):
                           to_agent: str,
                           message_type: MessageType,
                           content: Dict[str, Any],
-                          priority: MessagePriority = MessagePriority.MEDIUM) -> str:
+                          priority: MessagePriority = DEFAULT_PRIORITY) -> str:
         """Send message to another agent"""
         try:
-            message_id = await message_broker.send_message(
-                from_agent=self.agent_name,
-                to_agent=to_agent,
-                message_type=message_type,
-                content=content,
-                priority=priority
+            # Fast path: deliver synchronously when no recipient needs an await
+            message_id = message_broker.try_send_nowait(
+                self.agent_name, to_agent, message_type, content, priority
             )
+            if message_id is None:
+                message_id = await message_broker.send_message(
+                    from_agent=self.agent_name,
+                    to_agent=to_agent,
+                    message_type=message_type,
+                    content=content,
+                    priority=priority
+                )
             
-            self.stats['messages_sent'] += 1
-            self.logger.debug(f"Sent message {message_id} to {to_agent}")
+            self.stats.messages_sent += 1
+            if self._debug_enabled:
+                self._log_debug("Sent message %s to %s", message_id, to_agent)
             
             return message_id
             
@@ -210,24 +412,53 @@ class BaseAgent(ABC):
     async def broadcast_message(self,
                                message_type: MessageType,
                                content: Dict[str, Any],
-                               priority: MessagePriority = MessagePriority.MEDIUM) -> str:
+                               priority: MessagePriority = DEFAULT_PRIORITY) -> str:
         """Broadcast message to all agents"""
         return await self.send_message("broadcast", message_type, content, priority)
     
+    @property
+    def last_heartbeat(self) -> datetime:
+        """Wall-clock time of the last heartbeat"""
+        return self._mono_to_datetime(self._last_heartbeat_mono)
+    
+    def _mono_to_datetime(self, mono: float) -> datetime:
+        """Convert a monotonic timestamp to wall-clock UTC datetime"""
+        return self._wall_anchor + timedelta(seconds=mono - self._mono_anchor)
+    
     def get_status(self) -> Dict[str, Any]:
-        """Get current agent status and metrics"""
-        uptime = (datetime.utcnow() - self.stats['start_time']).total_seconds() if self.stats['start_time'] else 0
+        """Get current agent status and metrics (cached for status_cache_ttl seconds)"""
+        now = time.monotonic()
+        if self._status_cache is not None and now < self._status_cache_deadline:
+            return self._status_cache
+        
+        uptime = now - self._start_mono if self._start_mono is not None else 0
         
-        return {
+        stats = asdict(self.stats)
+        if self._last_activity_mono is not None:
+            stats['last_activity'] = self._mono_to_datetime(self._last_activity_mono)
+        
+        self._status_cache = {
             'agent_name': self.agent_name,
             'description': self.description,
             'status': self.status.value,
             'last_heartbeat': self.last_heartbeat.isoformat(),
             'error_count': self.error_count,
             'uptime_seconds': uptime,
-            'stats': self.stats.copy(),
-            'capabilities': self.get_capabilities()
+            'stats': stats,
+            'capabilities': self._capabilities or tuple(self.get_capabilities())
         }
+        self._status_cache_deadline = now + self.status_cache_ttl
+        
+        return self._status_cache
+    
+    def _on_state_change(self):
+        """Invalidate cached status and publish the change to status subscribers"""
+        self._status_cache_deadline = 0.0
+        message_broker.publish(AGENT_STATUS_TOPIC, {
+            'agent': self.agent_name,
+            'status': self.status.value,
+            'error_count': self.error_count
+        })
     
     # ===== ABSTRACT METHODS (Must be implemented by subclasses) =====
     
@@ -268,40 +499,73 @@ class BaseAgent(ABC):
         return db_manager.get_session()
     
     async def log_decision(self, decision_type: str, data: Dict[str, Any], confidence: float = 1.0):
-        """Log agent decision to database"""
+        """Queue agent decision for the next batched database write"""
         try:
             from core.database import AgentDecision
             
+            if len(self._decision_buffer) == self._decision_buffer.maxlen:
+                self.logger.warning("Decision buffer full, dropping oldest decision")
+            
+            self._decision_buffer.append(AgentDecision(
+                agent_name=self.agent_name,
+                decision_type=decision_type,
+                data=data,
+                confidence_score=confidence
+            ))
+            
+            if self._debug_enabled:
+                self._log_debug("Queued decision: %s", decision_type)
+            
+        except Exception as e:
+            self.logger.error(f"Failed to log decision: {e}")
+    
+    async def _decision_flush_loop(self):
+        """Periodically flush buffered decisions to the database"""
+        while self._running:
+            await asyncio.sleep(self.decision_flush_interval)
+            await self._flush_decisions()
+    
+    async def _flush_decisions(self):
+        """Hand buffered decisions to a worker thread for a single batched write"""
+        if not self._decision_buffer:
+            return
+        
+        # Swap the buffer on the event loop thread, write it off-loop
+        batch = list(self._decision_buffer)
+        self._decision_buffer.clear()
+        
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write_decisions, batch)
+    
+    def _write_decisions(self, batch: List[Any]):
+        """Write a batch of decisions in one transaction (blocking, runs in executor)"""
+        try:
             session = self.get_db_session()
             try:
-                decision = AgentDecision(
-                    agent_name=self.agent_name,
-                    decision_type=decision_type,
-                    data=data,
-                    confidence_score=confidence
-                )
-                session.add(decision)
+                session.bulk_save_objects(batch)
                 session.commit()
                 
-                self.logger.debug(f"Logged decision: {decision_type}")
+                self.logger.debug("Flushed %d decisions", len(batch))
                 
+            except Exception:
+                session.rollback()
+                raise
             finally:
                 session.close()
                 
         except Exception as e:
-            self.logger.error(f"Failed to log decision: {e}")
+            self.logger.error(f"Failed to flush {len(batch)} decisions: {e}")
     
     def is_healthy(self) -> bool:
         """Check if agent is healthy"""
-        if self.status == AgentStatus.ERROR:
+        if self.status is AgentStatus.ERROR:
             return False
         
         if self.error_count >= self.max_errors:
             return False
         
         # Check if heartbeat is recent (within 2 minutes)
-        time_since_heartbeat = (datetime.utcnow() - self.last_heartbeat).total_seconds()
-        if time_since_heartbeat > 120:
+        if time.monotonic() - self._last_heartbeat_mono > 120.0:
             return False
         
         return True
@@ -311,4 +575,5 @@ class BaseAgent(ABC):
         self.error_count = 0
         if self.status == AgentStatus.ERROR:
             self.status = AgentStatus.RUNNING
+        self._on_state_change()
         self.logger.info(f"Error count reset for agent {self.agent_name}") 
\ No newline at end of file
@@ -4,16 +4,24 @@ Device control orchestration and execution for energy optimization
 """
 
 import asyncio
+import functools
+import heapq
+import itertools
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional, Set
+from collections import defaultdict, deque
 from dataclasses import dataclass
 from enum import Enum
 
+from sqlalchemy import and_, func
+
 from .base_agent import BaseAgent, AgentStatus
 from core.message_broker import MessageType, MessagePriority, Message
 from core.database import Device, ConsumptionLog
-from core.config import settings
+from core.config import settings, get_current_pricing_tier
 
 
 class DeviceStatus(Enum):
@@ -35,7 +43,29 @@ class ControlAction(Enum):
     SCHEDULE_CHANGE = "schedule_change"
 
 
-@dataclass
+# Value -> member lookups; the Enum constructor is only used to raise on unknown values
+_STATUS_MAP = {status.value: status for status in DeviceStatus}
+_ACTION_MAP = {action.value: action for action in ControlAction}
+_OFF_VALUE = DeviceStatus.OFF.value
+_ON_VALUE = DeviceStatus.ON.value
+
+# Supported-action building blocks, resolved to strings once
+_BASE_ACTIONS = (ControlAction.TURN_ON.value, ControlAction.TURN_OFF.value)
+_CONTROLLABLE_ACTIONS = (ControlAction.SET_POWER.value, ControlAction.REDUCE_POWER.value)
+_DELAY_ACTION = ControlAction.DELAY_OPERATION.value
+_DELAY_PRIORITIES = frozenset({'low', 'medium'})
+
+# Pricing depends only on the hour and the static tariff table, so 24 entries cover it
+_cached_pricing_tier = functools.lru_cache(maxsize=24)(get_current_pricing_tier)
+
+
+def _savings_dh(previous_power: int, actual_power: int, rate: float) -> float:
+    """Cost saved over one hour by dropping from previous_power to actual_power watts"""
+    power_diff = previous_power - actual_power  # Positive = savings
+    return power_diff * rate * 0.001 if power_diff > 0 else 0.0
+
+
+@dataclass(slots=True)
 class DeviceControlCommand:
     """Data class for device control commands"""
     device_id: str
@@ -47,9 +77,10 @@ class DeviceControlCommand:
     reason: str
     source_agent: str
     safety_checks_passed: bool = False
+    validated_at: float = 0.0  # time.monotonic() of the last passed safety check
 
 
-@dataclass
+@dataclass(slots=True)
 class ExecutionResult:
     """Data class for execution results"""
     device_id: str
@@ -59,6 +90,17 @@ class ExecutionResult:
     execution_time: datetime
     error_message: Optional[str]
     actual_savings_dh: float
+    
+    def reset(self, device_id: str, command: DeviceControlCommand, success: bool, actual_power: int,
+              execution_time: datetime, error_message: Optional[str], actual_savings_dh: float):
+        """Overwrite every field so a pooled instance carries nothing over from its previous use"""
+        self.device_id = device_id
+        self.command = command
+        self.success = success
+        self.actual_power = actual_power
+        self.execution_time = execution_time
+        self.error_message = error_message
+        self.actual_savings_dh = actual_savings_dh
 
 
 class ControllerAgent(BaseAgent):
@@ -80,10 +122,25 @@ class ControllerAgent(BaseAgent):
         )
         
         # Device control state
-        self.device_states = {}  # device_id -> current state
-        self.pending_commands = []  # Queue of commands to execute
-        self.scheduled_commands = []  # Future scheduled commands
+        # device_id -> current state; refreshes rebind the mapping and command updates replace a device's
+        # dict, so a state dict once handed out never changes (the mapping's entries are still replaced)
+        self.device_states = {}
+        self._device_summary_cache = {}  # device_id -> broadcast summary, replaced when the device changes
+        self._active_device_count = 0  # Devices whose status is not OFF
+        
+        # Status broadcasts are debounced so bursts of changes go out as one message
+        self.broadcast_debounce = 0.1
+        self._broadcast_handle: Optional[asyncio.TimerHandle] = None
+        self._pending_status_updates: Set[str] = set()  # Device ids changed since the last broadcast
+        self._broadcast_queue: asyncio.Queue = asyncio.Queue(maxsize=64)  # Drained by _drain_broadcast_queue
+        self._state_version = 0  # Bumped on every device state or override change
+        self._last_broadcast_version = -1  # State version covered by the last queued broadcast
+        self.pending_commands = []  # Heap of (priority_rank, scheduled_time, seq, command)
+        self.scheduled_commands = []  # Heap of (scheduled_time, seq, command) for future commands
         self.manual_overrides = {}  # device_id -> override status
+        self._override_expiry = []  # Heap of (expiry_ts epoch seconds, device_id); stale entries skipped on pop
+        
+        self.max_pending_commands = 1000  # Reject new commands beyond this queue depth
         
         # Safety and constraints
         self.safety_limits = {
@@ -93,9 +150,18 @@ class ControllerAgent(BaseAgent):
             'temperature_safety_range': (16, 30)  # Safe temperature range for HVAC
         }
         
+        # Constant limits bound once so per-command checks skip the dict lookups
+        self._max_power_change = self.safety_limits['max_power_change_per_minute']
+        self._min_rest_s = self.safety_limits['min_device_rest_time']
+        self._critical_protection = self.safety_limits['critical_device_protection']
+        self._temp_lo, self._temp_hi = (float(t) for t in self.safety_limits['temperature_safety_range'])
+        self.safety_recheck_interval = 10.0  # Seconds a passed safety check stays valid
+        
         # Execution tracking
-        self.execution_history = []
-        self.last_device_interaction = {}  # device_id -> last interaction time
+        self.max_execution_history = 100
+        self.execution_history = deque(maxlen=self.max_execution_history)  # Oldest records evict automatically
+        self._result_pool: List[ExecutionResult] = []  # Evicted results reused by _acquire_result
+        self.last_device_interaction = {}  # device_id -> time.monotonic() of last interaction
         self.failed_executions = {}  # device_id -> failure count
         
         # Performance metrics
@@ -105,12 +171,26 @@ class ControllerAgent(BaseAgent):
             'failed_executions': 0,
             'manual_overrides_handled': 0,
             'safety_blocks': 0,
+            'commands_rejected': 0,
             'total_energy_controlled_kwh': 0.0,
             'last_execution_time': None
         }
         
+        # Cycle scheduling
+        self.state_refresh_interval = 60  # Seconds between device state refreshes and health checks
+        self._last_states_refresh = float('-inf')
+        
         # Device capabilities mapping
         self.device_capabilities = {}
+        self._non_critical_device_ids: List[str] = []  # Emergency-stop targets, rebuilt on each capabilities load
+        self.device_info_ttl = 60  # Seconds before an unknown device may trigger a reload
+        self._capabilities_loaded_at = float('-inf')
+        
+        # Tie-breaker so heap entries never compare commands directly
+        self._command_seq = itertools.count()
+        
+        # Dedicated worker for blocking DB sessions, created per start in initialize()
+        self._db_pool: Optional[ThreadPoolExecutor] = None
         
         self.logger.info("Controller Agent initialized")
     
@@ -119,13 +199,18 @@ class ControllerAgent(BaseAgent):
         try:
             self.logger.info("Initializing Controller Agent...")
             
+            # Single worker keeps the controller's DB reads serialized and off the shared default pool
+            self._db_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="controller-db")
+            
             # Load device capabilities and current states
-            await self._load_device_capabilities()
             await self._initialize_device_states()
             
             # Set up safety monitoring
             await self._initialize_safety_systems()
             
+            # Start the status broadcast consumer
+            self._spawn(self._drain_broadcast_queue())
+            
             self.logger.info("Controller Agent initialized successfully")
             
         except Exception as e:
@@ -135,23 +220,38 @@ class ControllerAgent(BaseAgent):
     async def execute_cycle(self):
         """Execute one control cycle"""
         try:
+            # Drop manual overrides whose duration has elapsed
+            self._expire_manual_overrides()
+            
+            # Skip the cycle entirely when no command or state refresh is due
+            now = time.monotonic()
+            scheduled_due = bool(self.scheduled_commands) and self.scheduled_commands[0][0] <= datetime.utcnow()
+            refresh_due = now - self._last_states_refresh >= self.state_refresh_interval
+            if not self.pending_commands and not scheduled_due and not refresh_due:
+                return
+            
             # Process pending commands
-            await self._process_pending_commands()
+            if self.pending_commands:
+                await self._process_pending_commands()
             
             # Check scheduled commands for execution
-            await self._check_scheduled_commands()
-            
-            # Update device states
-            await self._update_device_states()
+            if scheduled_due:
+                await self._check_scheduled_commands()
             
-            # Perform health checks
-            await self._perform_device_health_checks()
-            
-            # Clean up old execution history
-            await self._cleanup_execution_history()
+            if refresh_due:
+                self._last_states_refresh = now
+                
+                # Update device states
+                await self._update_device_states()
+                
+                # Perform health checks
+                await self._perform_device_health_checks()
+                
+                # Reset stale failure counters (execution history evicts itself)
+                await self._reset_stale_failure_counters()
             
-            # Broadcast device status updates
-            await self._broadcast_device_status()
+            # Broadcast device status updates (coalesced with any command-driven changes)
+            self._schedule_broadcast()
             
         except Exception as e:
             self.logger.error(f"Error in controller cycle: {e}")
@@ -160,28 +260,14 @@ class ControllerAgent(BaseAgent):
     async def handle_message(self, message: Message):
         """Handle incoming messages from other agents"""
         try:
-            self.logger.debug(f"Received message: {message.type.value} from {message.from_agent}")
-            
-            if message.type == MessageType.OPTIMIZATION_RESULT:
-                await self._handle_optimization_schedule(message.content, message.from_agent)
-            
-            elif message.type == MessageType.MANUAL_OVERRIDE:
-                await self._handle_manual_override(message.content)
-            
-            elif message.type == MessageType.DEVICE_CONTROL:
-                await self._handle_device_control_request(message.content, message.from_agent)
-            
-            elif message.type == MessageType.EMERGENCY_STOP:
-                await self._handle_emergency_stop(message.content)
-            
-            elif message.type == MessageType.SYSTEM_STATUS:
-                await self._send_controller_status(message.from_agent)
-            
-            elif message.type == MessageType.HEALTH_CHECK:
-                await self._handle_health_check_request(message.content, message.from_agent)
+            if self._debug_enabled:
+                self._log_debug("Received message: %s from %s", message.type.value, message.from_agent)
             
+            handler = self._MESSAGE_HANDLERS.get(message.type)
+            if handler:
+                await handler(self, message.content, message.from_agent)
             else:
-                self.logger.debug(f"Unhandled message type: {message.type.value}")
+                self.logger.debug("Unhandled message type: %s", message.type.value)
                 
         except Exception as e:
             self.logger.error(f"Error handling message: {e}")
@@ -197,6 +283,16 @@ class ControllerAgent(BaseAgent):
         self.pending_commands.clear()
         self.scheduled_commands.clear()
         self.execution_history.clear()
+        self._result_pool.clear()
+        self._override_expiry.clear()
+        
+        if self._broadcast_handle:
+            self._broadcast_handle.cancel()
+            self._broadcast_handle = None
+        
+        if self._db_pool:
+            self._db_pool.shutdown(wait=False)
+            self._db_pool = None
     
     def get_capabilities(self) -> List[str]:
         """Return agent capabilities"""
@@ -221,60 +317,108 @@ class ControllerAgent(BaseAgent):
             if not self.pending_commands:
                 return
             
-            # Sort commands by priority and time
-            self.pending_commands.sort(key=lambda cmd: (
-                cmd.priority != 'high',  # High priority first
-                cmd.scheduled_time
-            ))
+            deferred = []
+            executed = []
             
-            executed_commands = []
+            # Pop the top commands (high priority first, then earliest); max 5 per cycle
+            for _ in range(min(5, len(self.pending_commands))):
+                entry = heapq.heappop(self.pending_commands)
+                command = entry[-1]
+                
+                if not await self._can_execute_command(command):
+                    deferred.append(entry)
+                    continue
+                
+                result = await self._execute_device_command(command)
+                executed.append(result)
+                
+                # Log execution
+                self._record_execution(result)
+                
+                # Update statistics
+                self.controller_stats['commands_executed'] += 1
+                if result.success:
+                    self.controller_stats['successful_executions'] += 1
+                else:
+                    self.controller_stats['failed_executions'] += 1
+                
+                self.logger.info("Executed command for %s: %s", command.device_name, result.success)
             
-            for command in self.pending_commands[:5]:  # Process max 5 commands per cycle
-                if await self._can_execute_command(command):
-                    result = await self._execute_device_command(command)
-                    executed_commands.append(command)
-                    
-                    # Send execution result
-                    await self._send_execution_result(result)
-                    
-                    # Log execution
-                    self.execution_history.append(result)
-                    
-                    # Update statistics
-                    self.controller_stats['commands_executed'] += 1
-                    if result.success:
-                        self.controller_stats['successful_executions'] += 1
-                    else:
-                        self.controller_stats['failed_executions'] += 1
-                    
-                    self.logger.info(f"Executed command for {command.device_name}: {result.success}")
+            # Commands that could not run yet stay queued
+            self._merge_into_heap(self.pending_commands, deferred)
             
-            # Remove executed commands
-            for cmd in executed_commands:
-                self.pending_commands.remove(cmd)
+            # Send this cycle's execution results in one message per recipient
+            if executed:
+                await self._send_execution_results(executed)
             
         except Exception as e:
             self.logger.error(f"Error processing pending commands: {e}")
     
+    def _queue_pending_command(self, command: DeviceControlCommand) -> bool:
+        """Push a command onto the pending priority heap, rejecting it when the queue is full"""
+        if len(self.pending_commands) >= self.max_pending_commands:
+            self.controller_stats['commands_rejected'] += 1
+            self.logger.warning(f"Pending queue full, rejected command for {command.device_id}")
+            return False
+        
+        rank = 0 if command.priority == 'high' else 1
+        heapq.heappush(self.pending_commands, (rank, command.scheduled_time, next(self._command_seq), command))
+        return True
+    
+    def _queue_pending_commands(self, commands: List[DeviceControlCommand]) -> List[DeviceControlCommand]:
+        """Push several commands onto the pending heap at once; returns those accepted"""
+        room = max(self.max_pending_commands - len(self.pending_commands), 0)
+        if len(commands) > room:
+            self.controller_stats['commands_rejected'] += len(commands) - room
+            self.logger.warning(f"Pending queue full, rejected {len(commands) - room} commands")
+            commands = commands[:room]
+        
+        self._merge_into_heap(self.pending_commands, [
+            (0 if command.priority == 'high' else 1, command.scheduled_time, next(self._command_seq), command)
+            for command in commands
+        ])
+        return commands
+    
+    @staticmethod
+    def _merge_into_heap(heap: List[tuple], entries: List[tuple]):
+        """Add entries to a heap, re-heapifying once when the batch is large relative to the heap"""
+        if len(entries) > len(heap) // 4:
+            heap.extend(entries)
+            heapq.heapify(heap)
+        else:
+            for entry in entries:
+                heapq.heappush(heap, entry)
+    
     async def _check_scheduled_commands(self):
         """Check if any scheduled commands are ready for execution"""
         try:
             current_time = datetime.utcnow()
-            ready_commands = []
-            
-            for command in self.scheduled_commands:
-                if command.scheduled_time <= current_time:
-                    ready_commands.append(command)
             
-            # Move ready commands to pending queue
-            for command in ready_commands:
-                self.pending_commands.append(command)
-                self.scheduled_commands.remove(command)
-                self.logger.info(f"Scheduled command for {command.device_name} is ready for execution")
+            # Move due commands to pending queue; the heap head is always the earliest
+            # Due commands wait in the scheduled heap while the pending queue is full
+            while (self.scheduled_commands and self.scheduled_commands[0][0] <= current_time and
+                   len(self.pending_commands) < self.max_pending_commands):
+                _, _, command = heapq.heappop(self.scheduled_commands)
+                self._queue_pending_command(command)
+                self.logger.info("Scheduled command for %s is ready for execution", command.device_name)
             
         except Exception as e:
             self.logger.error(f"Error checking scheduled commands: {e}")
     
+    def _expire_manual_overrides(self):
+        """Pop overrides off the expiry heap once their duration has elapsed"""
+        now = time.time()
+        
+        while self._override_expiry and self._override_expiry[0][0] <= now:
+            expiry_ts, device_id = heapq.heappop(self._override_expiry)
+            
+            # A renewed override leaves an older heap entry behind; only the current one counts
+            override = self.manual_overrides.get(device_id)
+            if override and override.get('expiry_ts') == expiry_ts:
+                del self.manual_overrides[device_id]
+                self._state_version += 1
+                self.logger.info(f"Expired manual override for device {device_id}")
+    
     async def _can_execute_command(self, command: DeviceControlCommand) -> bool:
         """Check if a command can be safely executed"""
         try:
@@ -287,8 +431,10 @@ class ControllerAgent(BaseAgent):
                     self.logger.warning(f"Command blocked by manual override for device {device_id}")
                     return False
             
-            # Check safety constraints
-            if not await self._check_safety_constraints(command):
+            # Check safety constraints, trusting a check that passed moments ago
+            recently_validated = (command.validated_at and
+                                  time.monotonic() - command.validated_at < self.safety_recheck_interval)
+            if not recently_validated and not await self._check_safety_constraints(command):
                 self.controller_stats['safety_blocks'] += 1
                 return False
             
@@ -298,9 +444,10 @@ class ControllerAgent(BaseAgent):
             
             # Check minimum rest time between operations
             if device_id in self.last_device_interaction:
-                time_since_last = (datetime.utcnow() - self.last_device_interaction[device_id]).total_seconds()
-                if time_since_last < self.safety_limits['min_device_rest_time']:
-                    self.logger.debug(f"Device {device_id} needs rest time: {time_since_last}s < {self.safety_limits['min_device_rest_time']}s")
+                time_since_last = time.monotonic() - self.last_device_interaction[device_id]
+                if time_since_last < self._min_rest_s:
+                    if self._debug_enabled:
+                        self._log_debug("Device %s needs rest time: %.0fs < %ss", device_id, time_since_last, self._min_rest_s)
                     return False
             
             return True
@@ -311,12 +458,33 @@ class ControllerAgent(BaseAgent):
     
     async def _execute_device_command(self, command: DeviceControlCommand) -> ExecutionResult:
         """Execute a device control command"""
+        execution_time = datetime.utcnow()
+        
+        self.logger.info("Executing %s for %s", command.action.value, command.device_name)
+        
+        result = await self._apply_command(command, execution_time)
+        self.controller_stats['last_execution_time'] = execution_time
+        
+        return result
+    
+    async def _execute_bulk_command(self, commands: List[DeviceControlCommand]) -> List[ExecutionResult]:
+        """Execute several device commands in one pass, sharing the timestamp and statistics update"""
+        execution_time = datetime.utcnow()
+        
+        self.logger.info("Executing bulk command for %d devices", len(commands))
+        
+        results = [await self._apply_command(command, execution_time) for command in commands]
+        self.controller_stats['last_execution_time'] = execution_time
+        
+        return results
+    
+    async def _apply_command(self, command: DeviceControlCommand, execution_time: datetime) -> ExecutionResult:
+        """Control one device, update its state and build the execution result"""
+        device_id = command.device_id
         try:
-            device_id = command.device_id
-            device_name = command.device_name
-            execution_time = datetime.utcnow()
-            
-            self.logger.info(f"Executing {command.action.value} for {device_name}")
+            # Capture the pre-command power; the state update below overwrites it
+            state = self.device_states.get(device_id)
+            previous_power = state['current_power'] if state else 0
             
             # Simulate device control (in real implementation, this would interface with actual IoT devices)
             success, actual_power, error_message = await self._simulate_device_control(command)
@@ -324,90 +492,85 @@ class ControllerAgent(BaseAgent):
             # Update device state
             if success:
                 await self._update_device_state(device_id, command.action, actual_power)
-                self.last_device_interaction[device_id] = execution_time
-            
-            # Calculate actual savings
-            actual_savings = await self._calculate_actual_savings(command, actual_power, success)
-            
-            result = ExecutionResult(
-                device_id=device_id,
-                command=command,
-                success=success,
-                actual_power=actual_power,
-                execution_time=execution_time,
-                error_message=error_message,
-                actual_savings_dh=actual_savings
-            )
-            
-            # Update controller statistics
-            self.controller_stats['last_execution_time'] = execution_time
-            if success:
+                self.last_device_interaction[device_id] = time.monotonic()
                 self.controller_stats['total_energy_controlled_kwh'] += abs(actual_power - command.target_value) / 1000
             
-            return result
+            # Calculate actual savings
+            actual_savings = self._calculate_actual_savings(previous_power, actual_power, success)
             
         except Exception as e:
             self.logger.error(f"Failed to execute command for {device_id}: {e}")
-            return ExecutionResult(
-                device_id=device_id,
-                command=command,
-                success=False,
-                actual_power=0,
-                execution_time=execution_time,
-                error_message=str(e),
-                actual_savings_dh=0.0
-            )
+            success, actual_power, error_message, actual_savings = False, 0, str(e), 0.0
+        
+        return self._acquire_result(device_id, command, success, actual_power,
+                                    execution_time, error_message, actual_savings)
+    
+    def _acquire_result(self, device_id: str, command: DeviceControlCommand, success: bool, actual_power: int,
+                        execution_time: datetime, error_message: Optional[str],
+                        actual_savings_dh: float) -> ExecutionResult:
+        """Build an ExecutionResult, reusing a pooled instance when one is available"""
+        if not self._result_pool:
+            return ExecutionResult(device_id, command, success, actual_power,
+                                   execution_time, error_message, actual_savings_dh)
+        
+        result = self._result_pool.pop()
+        result.reset(device_id, command, success, actual_power, execution_time, error_message, actual_savings_dh)
+        return result
+    
+    def _record_execution(self, result: ExecutionResult):
+        """Append a result to the history, returning the evicted record to the pool"""
+        history = self.execution_history
+        if len(history) == history.maxlen:
+            evicted = history.popleft()
+            evicted.command = None  # Drop the command reference while pooled
+            if len(self._result_pool) < self.max_execution_history:
+                self._result_pool.append(evicted)
+        history.append(result)
     
     async def _simulate_device_control(self, command: DeviceControlCommand) -> tuple[bool, int, Optional[str]]:
         """Simulate device control operation (replace with real IoT integration)"""
         try:
-            device_id = command.device_id
-            action = command.action
-            target_value = command.target_value
-            
             # Get current device state
-            current_state = self.device_states.get(device_id, {})
-            current_power = current_state.get('current_power', 0)
+            current_power = self.device_states.get(command.device_id, {}).get('current_power', 0)
             
             # Simulate different device responses
-            if action == ControlAction.TURN_ON:
-                # Simulate turning device on
-                if current_power < 10:  # Device was off
-                    actual_power = target_value if target_value > 0 else self._get_device_default_power(device_id)
-                    return True, actual_power, None
-                else:
-                    return True, current_power, "Device was already on"
-            
-            elif action == ControlAction.TURN_OFF:
-                # Simulate turning device off
-                actual_power = 5  # Standby power
-                return True, actual_power, None
-            
-            elif action == ControlAction.SET_POWER:
-                # Simulate setting specific power level
-                actual_power = target_value
-                # Add some realistic variance (±5%)
-                variance = int(target_value * 0.05)
-                actual_power += variance if target_value > 100 else 0
-                return True, actual_power, None
-            
-            elif action == ControlAction.REDUCE_POWER:
-                # Simulate reducing power
-                reduction_factor = target_value / 100 if target_value <= 100 else 0.7
-                actual_power = int(current_power * reduction_factor)
-                return True, actual_power, None
-            
-            elif action == ControlAction.DELAY_OPERATION:
-                # Simulate delaying operation (turn off for now)
-                actual_power = 5  # Standby power
-                return True, actual_power, f"Operation delayed to {command.scheduled_time}"
-            
-            else:
-                return False, current_power, f"Unknown action: {action.value}"
+            simulator = self._ACTION_SIMULATORS.get(command.action)
+            if simulator is None:
+                return False, current_power, f"Unknown action: {command.action.value}"
+            return simulator(self, command, current_power)
             
         except Exception as e:
             return False, 0, f"Simulation error: {str(e)}"
     
+    def _sim_turn_on(self, command: DeviceControlCommand, current_power: int) -> tuple[bool, int, Optional[str]]:
+        """Simulate turning device on"""
+        if current_power < 10:  # Device was off
+            target_value = command.target_value
+            actual_power = target_value if target_value > 0 else self._get_device_default_power(command.device_id)
+            return True, actual_power, None
+        return True, current_power, "Device was already on"
+    
+    def _sim_turn_off(self, command: DeviceControlCommand, current_power: int) -> tuple[bool, int, Optional[str]]:
+        """Simulate turning device off"""
+        return True, 5, None  # Standby power
+    
+    def _sim_set_power(self, command: DeviceControlCommand, current_power: int) -> tuple[bool, int, Optional[str]]:
+        """Simulate setting specific power level"""
+        target_value = command.target_value
+        # Add some realistic variance (±5%)
+        variance = int(target_value * 0.05)
+        return True, target_value + (variance if target_value > 100 else 0), None
+    
+    def _sim_reduce_power(self, command: DeviceControlCommand, current_power: int) -> tuple[bool, int, Optional[str]]:
+        """Simulate reducing power"""
+        target_value = command.target_value
+        reduction_factor = target_value / 100 if target_value <= 100 else 0.7
+        return True, int(current_power * reduction_factor), None
+    
+    def _sim_delay_operation(self, command: DeviceControlCommand, current_power: int) -> tuple[bool, int, Optional[str]]:
+        """Simulate delaying operation (turn off for now)"""
+        return True, 5, f"Operation delayed to {command.scheduled_time}"  # Standby power
+    
     # ===== SAFETY AND MONITORING METHODS =====
     
     async def _check_safety_constraints(self, command: DeviceControlCommand) -> bool:
@@ -424,7 +587,7 @@ class ControllerAgent(BaseAgent):
                 return False
             
             # Check critical device protection
-            if (self.safety_limits['critical_device_protection'] and 
+            if (self._critical_protection and 
                 device_info.get('priority') == 'critical' and 
                 action in [ControlAction.TURN_OFF, ControlAction.REDUCE_POWER]):
                 self.logger.warning(f"Blocked operation on critical device {device_id}")
@@ -439,7 +602,7 @@ class ControllerAgent(BaseAgent):
             # Check power change rate
             current_power = self.device_states.get(device_id, {}).get('current_power', 0)
             power_change = abs(target_value - current_power)
-            if power_change > self.safety_limits['max_power_change_per_minute']:
+            if power_change > self._max_power_change:
                 self.logger.warning(f"Power change rate too high for {device_id}: {power_change}W")
                 return False
             
@@ -448,11 +611,11 @@ class ControllerAgent(BaseAgent):
                 if action == ControlAction.SET_POWER:
                     # Estimate temperature impact (simplified)
                     estimated_temp = self._estimate_temperature_impact(device_info, target_value)
-                    temp_range = self.safety_limits['temperature_safety_range']
-                    if not (temp_range[0] <= estimated_temp <= temp_range[1]):
+                    if not (self._temp_lo <= estimated_temp <= self._temp_hi):
                         self.logger.warning(f"Temperature safety violation for {device_id}: {estimated_temp}°C")
                         return False
             
+            command.validated_at = time.monotonic()
             return True
             
         except Exception as e:
@@ -489,24 +652,34 @@ class ControllerAgent(BaseAgent):
     async def _perform_device_health_checks(self):
         """Perform health checks on all controlled devices"""
         try:
-            for device_id, state in self.device_states.items():
-                # Check for anomalous power consumption
-                current_power = state.get('current_power', 0)
-                expected_power = state.get('expected_power', current_power)
-                
-                if abs(current_power - expected_power) > expected_power * 0.3:  # 30% deviation
-                    self.logger.warning(f"Power anomaly detected for {device_id}: {current_power}W vs expected {expected_power}W")
-                    await self._report_device_anomaly(device_id, 'power_anomaly', {
-                        'current_power': current_power,
-                        'expected_power': expected_power
-                    })
-                
-                # Check device responsiveness
-                last_interaction = self.last_device_interaction.get(device_id)
-                if last_interaction:
-                    time_since_interaction = (datetime.utcnow() - last_interaction).total_seconds()
-                    if time_since_interaction > 3600:  # 1 hour without interaction
-                        await self._check_device_responsiveness(device_id)
+            # Read the active buffer once; refreshes swap in a new dict rather than mutating this one
+            states = self.device_states
+            
+            # Single pass over the states to find power anomalies (30% deviation); only the hits are reported
+            anomalies = [
+                (device_id, current_power, expected_power)
+                for device_id, current_power, expected_power in (
+                    (device_id, state.get('current_power', 0), state.get('expected_power', state.get('current_power', 0)))
+                    for device_id, state in states.items()
+                )
+                if abs(current_power - expected_power) > expected_power * 0.3
+            ]
+            
+            for device_id, current_power, expected_power in anomalies:
+                self.logger.warning("Power anomaly detected for %s: %sW vs expected %sW", device_id, current_power, expected_power)
+                await self._report_device_anomaly(device_id, 'power_anomaly', {
+                    'current_power': current_power,
+                    'expected_power': expected_power
+                })
+            
+            # Check device responsiveness (1 hour without interaction), all idle devices at once
+            now = time.monotonic()
+            idle_devices = [
+                device_id for device_id, last_interaction in self.last_device_interaction.items()
+                if device_id in states and now - last_interaction > 3600
+            ]
+            if idle_devices:
+                await asyncio.gather(*(self._check_device_responsiveness(device_id) for device_id in idle_devices))
             
         except Exception as e:
             self.logger.error(f"Error performing device health checks: {e}")
@@ -523,38 +696,57 @@ class ControllerAgent(BaseAgent):
                 self.logger.info("Optimization disabled, ignoring schedule")
                 return
             
-            commands_added = 0
+            commands = []
             
             for schedule_item in schedule_data:
                 try:
                     # Convert schedule item to control command
-                    command = DeviceControlCommand(
+                    action_value = schedule_item['action'].replace(' ', '_').lower()
+                    commands.append(DeviceControlCommand(
                         device_id=schedule_item['device_id'],
                         device_name=schedule_item['device_name'],
-                        action=ControlAction(schedule_item['action'].replace(' ', '_').lower()),
+                        action=_ACTION_MAP.get(action_value) or ControlAction(action_value),
                         target_value=schedule_item['target_power'],
                         scheduled_time=datetime.fromisoformat(schedule_item['scheduled_time']),
                         priority=schedule_item['priority'],
                         reason=schedule_item['reason'],
                         source_agent=from_agent
-                    )
-                    
-                    # Perform safety checks
-                    if await self._check_safety_constraints(command):
-                        # Add to appropriate queue
-                        if command.scheduled_time <= datetime.utcnow() + timedelta(minutes=5):
-                            self.pending_commands.append(command)
-                        else:
-                            self.scheduled_commands.append(command)
-                        
-                        commands_added += 1
-                        command.safety_checks_passed = True
-                    else:
-                        self.logger.warning(f"Safety check failed for optimization command: {command.device_name}")
+                    ))
                 
                 except Exception as e:
                     self.logger.error(f"Error processing schedule item: {e}")
             
+            # Perform safety checks for all commands concurrently
+            checks = await asyncio.gather(
+                *(self._check_safety_constraints(command) for command in commands),
+                return_exceptions=True
+            )
+            
+            queue_horizon = datetime.utcnow() + timedelta(minutes=5)
+            ready_commands = []
+            future_commands = []
+            
+            for command, passed in zip(commands, checks):
+                if passed is not True:
+                    self.logger.warning(f"Safety check failed for optimization command: {command.device_name}")
+                    continue
+                
+                # Sort into the appropriate queue
+                if command.scheduled_time <= queue_horizon:
+                    ready_commands.append(command)
+                else:
+                    future_commands.append(command)
+            
+            # Add the accepted commands to both heaps in bulk
+            accepted = self._queue_pending_commands(ready_commands) + future_commands
+            self._merge_into_heap(self.scheduled_commands, [
+                (command.scheduled_time, next(self._command_seq), command) for command in future_commands
+            ])
+            
+            for command in accepted:
+                command.safety_checks_passed = True
+            commands_added = len(accepted)
+            
             self.logger.info(f"Added {commands_added} optimization commands from {from_agent}")
             
             # Send acknowledgment
@@ -573,7 +765,7 @@ class ControllerAgent(BaseAgent):
         except Exception as e:
             self.logger.error(f"Failed to handle optimization schedule: {e}")
     
-    async def _handle_manual_override(self, content: Dict[str, Any]):
+    async def _handle_manual_override(self, content: Dict[str, Any], from_agent: str):
         """Handle manual override requests"""
         try:
             device_id = content.get('device_id')
@@ -586,13 +778,18 @@ class ControllerAgent(BaseAgent):
                 return
             
             # Set manual override
+            start_time = datetime.utcnow()
+            expiry_ts = time.time() + override_duration * 60
             self.manual_overrides[device_id] = {
                 'active': True,
                 'block_automation': block_automation,
-                'start_time': datetime.utcnow(),
+                'start_time': start_time,
                 'duration_minutes': override_duration,
+                'expiry_ts': expiry_ts,
                 'reason': content.get('reason', 'Manual user override')
             }
+            heapq.heappush(self._override_expiry, (expiry_ts, device_id))
+            self._state_version += 1
             
             # If immediate action requested, create command
             if action and action != 'block_only':
@@ -602,9 +799,9 @@ class ControllerAgent(BaseAgent):
                     command = DeviceControlCommand(
                         device_id=device_id,
                         device_name=content.get('device_name', f'Device {device_id}'),
-                        action=ControlAction(action),
+                        action=_ACTION_MAP.get(action) or ControlAction(action),
                         target_value=target_value,
-                        scheduled_time=datetime.utcnow(),
+                        scheduled_time=start_time,
                         priority='high',
                         reason='Manual override command',
                         source_agent='user_interface'
@@ -612,8 +809,8 @@ class ControllerAgent(BaseAgent):
                     
                     # Execute immediately (bypass some automation checks)
                     if await self._check_safety_constraints(command):
-                        self.pending_commands.insert(0, command)  # High priority
-                        self.logger.info(f"Manual override command added for {device_id}")
+                        if self._queue_pending_command(command):  # High priority
+                            self.logger.info(f"Manual override command added for {device_id}")
                     else:
                         self.logger.error(f"Manual override command failed safety check for {device_id}")
                 
@@ -642,7 +839,7 @@ class ControllerAgent(BaseAgent):
             command = DeviceControlCommand(
                 device_id=device_id,
                 device_name=content.get('device_name', f'Device {device_id}'),
-                action=ControlAction(action),
+                action=_ACTION_MAP.get(action) or ControlAction(action),
                 target_value=target_value,
                 scheduled_time=datetime.utcnow(),
                 priority=priority,
@@ -652,15 +849,15 @@ class ControllerAgent(BaseAgent):
             
             # Add to pending queue if safety checks pass
             if await self._check_safety_constraints(command):
-                self.pending_commands.append(command)
-                self.logger.info(f"Device control request added for {device_id} from {from_agent}")
+                if self._queue_pending_command(command):
+                    self.logger.info(f"Device control request added for {device_id} from {from_agent}")
             else:
                 self.logger.warning(f"Device control request failed safety check: {device_id}")
             
         except Exception as e:
             self.logger.error(f"Failed to handle device control request: {e}")
     
-    async def _handle_emergency_stop(self, content: Dict[str, Any]):
+    async def _handle_emergency_stop(self, content: Dict[str, Any], from_agent: str):
         """Handle emergency stop requests"""
         try:
             device_id = content.get('device_id')
@@ -678,43 +875,105 @@ class ControllerAgent(BaseAgent):
         except Exception as e:
             self.logger.error(f"Failed to handle emergency stop: {e}")
     
+    async def _handle_status_request(self, content: Dict[str, Any], from_agent: str):
+        """Handle controller status requests"""
+        await self._send_controller_status(from_agent)
+    
+    async def _handle_health_check_request(self, content: Dict[str, Any], from_agent: str):
+        """Handle health check requests by replying with the controller status"""
+        await self._send_controller_status(from_agent)
+    
     # ===== UTILITY AND STATE MANAGEMENT METHODS =====
     
     async def _update_device_states(self):
-        """Update device states from database"""
+        """Update device capabilities and states from database"""
         try:
-            session = self.get_db_session()
-            try:
-                devices = session.query(Device).all()
-                
-                for device in devices:
-                    # Get latest consumption data
-                    latest_log = session.query(ConsumptionLog).filter(
-                        ConsumptionLog.device_id == device.id
-                    ).order_by(ConsumptionLog.timestamp.desc()).first()
-                    
-                    if latest_log:
-                        self.device_states[device.id] = {
-                            'device_info': device,
-                            'current_power': latest_log.power_watts,
-                            'status': DeviceStatus(latest_log.status),
-                            'last_update': latest_log.timestamp,
-                            'temperature': latest_log.temperature,
-                            'efficiency': latest_log.efficiency_rating,
-                            'expected_power': device.power_watts  # Default expected power
-                        }
-            
-            finally:
-                session.close()
+            # Query off the event loop so message handling keeps running during DB I/O
+            loop = asyncio.get_running_loop()
+            capabilities, states = await loop.run_in_executor(self._db_pool, self._sync_load_devices)
+            
+            self.device_capabilities.update(capabilities)
+            self._capabilities_loaded_at = time.monotonic()
+            self._non_critical_device_ids = [
+                device_id for device_id, info in self.device_capabilities.items()
+                if info.get('priority') != 'critical'
+            ]
+            
+            for device_id, state in states.items():
+                self._refresh_device_summary(device_id, state)
+            
+            # The loader returns a fresh dict: carry over devices it had no reading for and rebind it,
+            # so a reader holding the previous mapping never sees it cleared or refilled
+            for device_id, state in self.device_states.items():
+                states.setdefault(device_id, state)
+            self.device_states = states
+            self._recount_active_devices()
+            self._state_version += 1
                 
         except Exception as e:
             self.logger.error(f"Failed to update device states: {e}")
     
+    def _sync_load_devices(self) -> tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        """Load every device with its latest consumption log in one query (runs in a worker thread)"""
+        capabilities = {}
+        states = {}
+        session = self.get_db_session()
+        try:
+            # Latest consumption log per device; devices without logs still come back via the outer joins
+            latest = session.query(
+                ConsumptionLog.device_id,
+                func.max(ConsumptionLog.timestamp).label('latest_timestamp')
+            ).group_by(ConsumptionLog.device_id).subquery()
+            
+            rows = session.query(Device, ConsumptionLog).outerjoin(
+                latest, latest.c.device_id == Device.id
+            ).outerjoin(
+                ConsumptionLog,
+                and_(
+                    ConsumptionLog.device_id == latest.c.device_id,
+                    ConsumptionLog.timestamp == latest.c.latest_timestamp
+                )
+            ).all()
+            
+            for device, latest_log in rows:
+                capabilities[device.id] = {
+                    'controllable': device.controllable,
+                    'power_watts': device.power_watts,
+                    'priority': device.priority,
+                    'usage_pattern': device.usage_pattern,
+                    'room': device.room,
+                    'actions_supported': self._get_supported_actions(device),
+                    # HVAC model: AC cools 2°C per kW, anything else heats 1.5°C per kW from room temperature
+                    'base_temp': 22.0,
+                    'temp_coef_per_kw': -2.0 if 'AC' in (device.name or '') else 1.5
+                }
+                
+                if latest_log:
+                    status = _STATUS_MAP.get(latest_log.status) or DeviceStatus(latest_log.status)
+                    states[device.id] = {
+                        'device_info': device,
+                        'current_power': latest_log.power_watts,
+                        'status': status,
+                        'status_value': status.value,
+                        'last_update': latest_log.timestamp,
+                        'temperature': latest_log.temperature,
+                        'efficiency': latest_log.efficiency_rating,
+                        'expected_power': device.power_watts  # Default expected power
+                    }
+        
+        finally:
+            session.close()
+        
+        return capabilities, states
+    
     async def _update_device_state(self, device_id: str, action: ControlAction, actual_power: int):
         """Update device state after command execution"""
         try:
-            if device_id in self.device_states:
-                state = self.device_states[device_id]
+            previous_state = self.device_states.get(device_id)
+            if previous_state is not None:
+                # Replace rather than mutate the device's dict, so readers holding it see a stable state
+                state = dict(previous_state)
+                was_off = state.get('status') == DeviceStatus.OFF
                 state['current_power'] = actual_power
                 state['last_update'] = datetime.utcnow()
                 
@@ -725,42 +984,44 @@ class ControllerAgent(BaseAgent):
                     state['status'] = DeviceStatus.STANDBY
                 else:
                     state['status'] = DeviceStatus.ON
+                state['status_value'] = state['status'].value
+                
+                # Keep the active count in step with OFF transitions
+                is_off = state['status'] == DeviceStatus.OFF
+                if was_off != is_off:
+                    self._active_device_count += 1 if was_off else -1
                 
                 # Update expected power for future comparisons
                 state['expected_power'] = actual_power
                 
+                self.device_states[device_id] = state
+                self._refresh_device_summary(device_id, state)
+                self._state_version += 1
+                self._schedule_broadcast(device_id)
+                
         except Exception as e:
             self.logger.error(f"Failed to update device state: {e}")
     
-    async def _load_device_capabilities(self):
-        """Load device capabilities from database"""
-        try:
-            session = self.get_db_session()
-            try:
-                devices = session.query(Device).all()
-                
-                for device in devices:
-                    self.device_capabilities[device.id] = {
-                        'controllable': device.controllable,
-                        'power_watts': device.power_watts,
-                        'priority': device.priority,
-                        'usage_pattern': device.usage_pattern,
-                        'room': device.room,
-                        'actions_supported': self._get_supported_actions(device)
-                    }
-                
-                self.logger.info(f"Loaded capabilities for {len(devices)} devices")
-                
-            finally:
-                session.close()
-                
-        except Exception as e:
-            self.logger.error(f"Failed to load device capabilities: {e}")
+    def _refresh_device_summary(self, device_id: str, state: Dict[str, Any]):
+        """Rebuild the broadcast summary entry for one device"""
+        last_update = state.get('last_update') or datetime.utcnow()
+        self._device_summary_cache[device_id] = {
+            'current_power': state.get('current_power', 0),
+            'status': state.get('status_value', _OFF_VALUE),
+            'last_update': last_update.isoformat()
+        }
+    
+    def _recount_active_devices(self):
+        """Recount non-OFF devices after the state set is replaced wholesale"""
+        self._active_device_count = sum(
+            1 for state in self.device_states.values() if state.get('status') != DeviceStatus.OFF
+        )
     
     async def _initialize_device_states(self):
         """Initialize device states from latest database readings"""
         try:
             await self._update_device_states()
+            self.logger.info(f"Loaded capabilities for {len(self.device_capabilities)} devices")
             
             # Initialize any missing states
             for device_id in self.device_capabilities:
@@ -768,11 +1029,14 @@ class ControllerAgent(BaseAgent):
                     self.device_states[device_id] = {
                         'current_power': 0,
                         'status': DeviceStatus.OFF,
+                        'status_value': _OFF_VALUE,
                         'last_update': datetime.utcnow(),
                         'temperature': 22,  # Default room temperature
                         'efficiency': 1.0,
                         'expected_power': 0
                     }
+                    self._refresh_device_summary(device_id, self.device_states[device_id])
+            self._recount_active_devices()
             
             self.logger.info(f"Initialized states for {len(self.device_states)} devices")
             
@@ -785,19 +1049,12 @@ class ControllerAgent(BaseAgent):
             # Reset failure counters
             self.failed_executions = {}
             
-            # Clear manual overrides older than 24 hours
-            current_time = datetime.utcnow()
-            expired_overrides = []
-            
-            for device_id, override in self.manual_overrides.items():
-                start_time = override.get('start_time', current_time)
-                duration = override.get('duration_minutes', 60)
-                if (current_time - start_time).total_seconds() > duration * 60:
-                    expired_overrides.append(device_id)
-            
-            for device_id in expired_overrides:
-                del self.manual_overrides[device_id]
-                self.logger.info(f"Expired manual override for device {device_id}")
+            # Rebuild the expiry heap from the stored timestamps, then clear overrides whose duration has elapsed
+            self._override_expiry = [
+                (override['expiry_ts'], device_id) for device_id, override in self.manual_overrides.items()
+            ]
+            heapq.heapify(self._override_expiry)
+            self._expire_manual_overrides()
             
             self.logger.info("Safety systems initialized")
             
@@ -806,81 +1063,145 @@ class ControllerAgent(BaseAgent):
     
     # ===== COMMUNICATION METHODS =====
     
-    async def _send_execution_result(self, result: ExecutionResult):
-        """Send execution result to relevant agents"""
+    async def _send_execution_results(self, results: List[ExecutionResult]):
+        """Send a batch of execution results to the relevant agents"""
         try:
-            result_data = {
-                'device_id': result.device_id,
-                'success': result.success,
-                'actual_power': result.actual_power,
-                'execution_time': result.execution_time.isoformat(),
-                'actual_savings_dh': result.actual_savings_dh,
-                'error_message': result.error_message,
-                'command_source': result.command.source_agent
-            }
+            results_by_source = defaultdict(list)
+            device_updates = []
+            states = self.device_states
+            
+            # Results from one batch share an execution time, so format it once per distinct value
+            last_time = None
+            execution_time = None
+            
+            for result in results:
+                source_agent = result.command.source_agent
+                if result.execution_time is not last_time:
+                    last_time = result.execution_time
+                    execution_time = last_time.isoformat()
+                if source_agent != self.agent_name:
+                    results_by_source[source_agent].append({
+                        'device_id': result.device_id,
+                        'success': result.success,
+                        'actual_power': result.actual_power,
+                        'execution_time': execution_time,
+                        'actual_savings_dh': result.actual_savings_dh,
+                        'error_message': result.error_message,
+                        'command_source': source_agent
+                    })
+                
+                state = states.get(result.device_id)
+                device_updates.append({
+                    'device_id': result.device_id,
+                    'current_power': result.actual_power,
+                    'status': state['status_value'] if state else _ON_VALUE,
+                    'timestamp': execution_time
+                })
             
-            # Send to source agent
-            if result.command.source_agent != self.agent_name:
-                await self.send_message(
-                    result.command.source_agent,
+            timestamp = datetime.utcnow().isoformat()
+            
+            # Replies to source agents and the monitor update are independent, so send them concurrently
+            sends = [
+                self.send_message(
+                    source_agent,
                     MessageType.EXECUTION_RESULT,
-                    result_data,
+                    {'results': result_data, 'timestamp': timestamp},
                     MessagePriority.HIGH
                 )
+                for source_agent, result_data in results_by_source.items()
+            ]
             
             # Broadcast to monitor agent for tracking
-            await self.send_message(
+            sends.append(self.send_message(
                 "monitor_agent",
                 MessageType.DEVICE_STATUS,
                 {
-                    'device_id': result.device_id,
-                    'current_power': result.actual_power,
-                    'status': self.device_states.get(result.device_id, {}).get('status', DeviceStatus.ON).value,
-                    'timestamp': result.execution_time.isoformat(),
+                    'devices': device_updates,
+                    'timestamp': timestamp,
                     'controlled_by': self.agent_name
                 },
                 MessagePriority.MEDIUM
-            )
+            ))
+            
+            for outcome in await asyncio.gather(*sends, return_exceptions=True):
+                if isinstance(outcome, Exception):
+                    self.logger.error(f"Failed to send execution result: {outcome}")
             
         except Exception as e:
-            self.logger.error(f"Failed to send execution result: {e}")
+            self.logger.error(f"Failed to send execution results: {e}")
     
-    async def _broadcast_device_status(self):
-        """Broadcast current device status to all agents"""
+    def _schedule_broadcast(self, device_id: Optional[str] = None):
+        """Request a status broadcast, merging with one already pending in the debounce window"""
+        if device_id:
+            self._pending_status_updates.add(device_id)
+        
+        if self._broadcast_handle is None:
+            self._broadcast_handle = asyncio.get_running_loop().call_later(
+                self.broadcast_debounce, self._fire_broadcast
+            )
+    
+    def _fire_broadcast(self):
+        """Debounce timer callback"""
+        self._broadcast_handle = None
+        self._broadcast_device_status()
+    
+    def _broadcast_device_status(self):
+        """Queue the current device status for broadcast to all agents"""
+        # Nothing changed and nothing queued since the last broadcast, so it would repeat itself
+        if self._state_version == self._last_broadcast_version and not self.pending_commands:
+            return
+        
         try:
+            changed_devices = list(self._pending_status_updates)
+            self._pending_status_updates.clear()
+            
             status_data = {
                 'timestamp': datetime.utcnow().isoformat(),
                 'total_devices': len(self.device_states),
-                'devices_controlled': len([d for d in self.device_states.values() if d.get('status') != DeviceStatus.OFF]),
+                'devices_controlled': self._active_device_count,
                 'pending_commands': len(self.pending_commands),
                 'scheduled_commands': len(self.scheduled_commands),
                 'manual_overrides': len(self.manual_overrides),
-                'controller_stats': self.controller_stats,
-                'device_summary': {
-                    device_id: {
-                        'current_power': state.get('current_power', 0),
-                        'status': state.get('status', DeviceStatus.OFF).value,
-                        'last_update': state.get('last_update', datetime.utcnow()).isoformat()
-                    }
-                    for device_id, state in self.device_states.items()
-                }
+                'controller_stats': self._stats_snapshot(),
+                # Entries are replaced, never mutated, so a shallow copy is a stable snapshot
+                'device_summary': dict(self._device_summary_cache),
+                'changed_devices': changed_devices
             }
             
-            await self.broadcast_message(
-                MessageType.DEVICE_STATUS,
-                status_data,
-                MessagePriority.LOW
-            )
+            self._broadcast_queue.put_nowait(status_data)
+            self._last_broadcast_version = self._state_version
             
+        except asyncio.QueueFull:
+            self.logger.warning("Device status broadcast queue full, dropping update")
         except Exception as e:
             self.logger.error(f"Failed to broadcast device status: {e}")
     
+    def _stats_snapshot(self) -> Dict[str, Any]:
+        """Copy of controller_stats with the timestamp pre-formatted so the payload is JSON-ready"""
+        stats = dict(self.controller_stats)
+        if stats['last_execution_time'] is not None:
+            stats['last_execution_time'] = stats['last_execution_time'].isoformat()
+        return stats
+    
+    async def _drain_broadcast_queue(self):
+        """Single consumer that sends queued status payloads, so slow delivery never blocks the cycle"""
+        while True:
+            status_data = await self._broadcast_queue.get()
+            try:
+                await self.broadcast_message(
+                    MessageType.DEVICE_STATUS,
+                    status_data,
+                    MessagePriority.LOW
+                )
+            except Exception as e:
+                self.logger.error(f"Failed to broadcast device status: {e}")
+    
     async def _send_controller_status(self, requesting_agent: str):
         """Send controller status to requesting agent"""
         try:
             status_data = {
                 'agent_name': self.agent_name,
-                'controller_stats': self.controller_stats,
+                'controller_stats': self._stats_snapshot(),
                 'device_count': len(self.device_states),
                 'pending_commands': len(self.pending_commands),
                 'scheduled_commands': len(self.scheduled_commands),
@@ -904,18 +1225,15 @@ class ControllerAgent(BaseAgent):
     
     def _get_supported_actions(self, device: Device) -> List[str]:
         """Get supported actions for a device"""
-        actions = [ControlAction.TURN_ON.value, ControlAction.TURN_OFF.value]
+        actions = _BASE_ACTIONS
         
         if device.controllable:
-            actions.extend([
-                ControlAction.SET_POWER.value,
-                ControlAction.REDUCE_POWER.value
-            ])
+            actions += _CONTROLLABLE_ACTIONS
             
-        if device.priority in ['low', 'medium']:
-            actions.append(ControlAction.DELAY_OPERATION.value)
+        if device.priority in _DELAY_PRIORITIES:
+            actions += (_DELAY_ACTION,)
             
-        return actions
+        return list(actions)
     
     def _get_device_default_power(self, device_id: str) -> int:
         """Get default power for a device when turned on"""
@@ -923,47 +1241,28 @@ class ControllerAgent(BaseAgent):
         return capabilities.get('power_watts', 100)  # Default 100W
     
     async def _get_device_info(self, device_id: str) -> Optional[Dict[str, Any]]:
-        """Get device information"""
-        return self.device_capabilities.get(device_id)
+        """Get device information, reloading capabilities at most once per TTL on a miss"""
+        info = self.device_capabilities.get(device_id)
+        if info is None and time.monotonic() - self._capabilities_loaded_at >= self.device_info_ttl:
+            self._capabilities_loaded_at = time.monotonic()  # Concurrent misses wait for the next TTL
+            await self._update_device_states()
+            info = self.device_capabilities.get(device_id)
+        return info
     
     def _estimate_temperature_impact(self, device_info: Dict[str, Any], power_level: int) -> float:
         """Estimate temperature impact of HVAC power level (simplified)"""
         # Very simplified estimation - in reality this would be much more complex
-        base_temp = 22  # Room temperature
-        if 'AC' in device_info.get('name', ''):
-            # AC cooling effect
-            cooling_effect = (power_level / 1000) * 2  # 2°C per kW
-            return base_temp - cooling_effect
-        else:
-            # Heating effect
-            heating_effect = (power_level / 1000) * 1.5  # 1.5°C per kW
-            return base_temp + heating_effect
+        return device_info['base_temp'] + device_info['temp_coef_per_kw'] * power_level / 1000
     
-    async def _calculate_actual_savings(self, command: DeviceControlCommand, actual_power: int, success: bool) -> float:
+    def _calculate_actual_savings(self, previous_power: int, actual_power: int, success: bool) -> float:
         """Calculate actual energy cost savings from command execution"""
-        if not success:
+        if not success or previous_power <= actual_power:
             return 0.0
         
         try:
-            # Get previous power level
-            device_state = self.device_states.get(command.device_id, {})
-            previous_power = device_state.get('current_power', 0)
-            
-            # Calculate power difference
-            power_diff = previous_power - actual_power  # Positive = savings
-            
-            if power_diff <= 0:
-                return 0.0
-            
             # Calculate cost savings (simplified - assumes 1 hour of operation)
-            from core.config import get_current_pricing_tier
-            current_hour = datetime.now().hour
-            pricing = get_current_pricing_tier(current_hour)
-            
-            savings_kwh = power_diff / 1000  # Convert to kWh
-            savings_dh = savings_kwh * pricing['rate']
-            
-            return max(0.0, savings_dh)
+            pricing = _cached_pricing_tier(datetime.now().hour)
+            return _savings_dh(previous_power, actual_power, pricing['rate'])
             
         except Exception as e:
             self.logger.error(f"Failed to calculate actual savings: {e}")
@@ -991,24 +1290,26 @@ class ControllerAgent(BaseAgent):
     async def _check_device_responsiveness(self, device_id: str):
         """Check if device is responding to commands"""
         # This would implement a ping/status check in a real system
-        self.logger.info(f"Checking responsiveness for device {device_id}")
+        self.logger.info("Checking responsiveness for device %s", device_id)
+    
+    def _build_emergency_command(self, device_id: str, reason: str) -> DeviceControlCommand:
+        """Build a turn-off command for an emergency stop"""
+        return DeviceControlCommand(
+            device_id=device_id,
+            device_name=f"Device {device_id}",
+            action=ControlAction.TURN_OFF,
+            target_value=0,
+            scheduled_time=datetime.utcnow(),
+            priority='high',
+            reason=f"Emergency stop: {reason}",
+            source_agent=self.agent_name
+        )
     
     async def _emergency_stop_device(self, device_id: str, reason: str):
         """Emergency stop for a specific device"""
         try:
-            command = DeviceControlCommand(
-                device_id=device_id,
-                device_name=f"Device {device_id}",
-                action=ControlAction.TURN_OFF,
-                target_value=0,
-                scheduled_time=datetime.utcnow(),
-                priority='high',
-                reason=f"Emergency stop: {reason}",
-                source_agent=self.agent_name
-            )
-            
             # Execute immediately without normal safety checks
-            result = await self._execute_device_command(command)
+            result = await self._execute_device_command(self._build_emergency_command(device_id, reason))
             self.logger.critical(f"Emergency stop executed for {device_id}: {result.success}")
             
         except Exception as e:
@@ -1017,38 +1318,66 @@ class ControllerAgent(BaseAgent):
     async def _emergency_stop_all_devices(self, reason: str = "System shutdown"):
         """Emergency stop for all non-critical devices"""
         try:
-            for device_id, capabilities in self.device_capabilities.items():
-                if capabilities.get('priority') != 'critical':
-                    await self._emergency_stop_device(device_id, reason)
+            commands = [self._build_emergency_command(device_id, reason) for device_id in self._non_critical_device_ids]
+            if not commands:
+                return
+            
+            # Execute immediately without normal safety checks, as one bulk operation
+            results = await self._execute_bulk_command(commands)
+            succeeded = sum(1 for result in results if result.success)
+            self.logger.critical(f"Emergency stop executed for {succeeded}/{len(results)} devices: {reason}")
             
         except Exception as e:
             self.logger.error(f"Failed emergency stop all devices: {e}")
     
-    async def _cleanup_execution_history(self):
-        """Clean up old execution history"""
+    async def _reset_stale_failure_counters(self):
+        """Reset failure counters for devices idle for over an hour"""
         try:
-            # Keep only last 100 execution records
-            if len(self.execution_history) > 100:
-                self.execution_history = self.execution_history[-100:]
-            
             # Clean up old failed execution counters
-            current_time = datetime.utcnow()
+            now = time.monotonic()
             for device_id in list(self.failed_executions.keys()):
                 last_interaction = self.last_device_interaction.get(device_id)
-                if last_interaction and (current_time - last_interaction).total_seconds() > 3600:  # 1 hour
+                if last_interaction and now - last_interaction > 3600:  # 1 hour
                     self.failed_executions[device_id] = 0  # Reset counter
             
         except Exception as e:
-            self.logger.error(f"Failed to cleanup execution history: {e}")
+            self.logger.error(f"Failed to reset failure counters: {e}")
     
     def get_current_controller_summary(self) -> Dict[str, Any]:
         """Get current controller summary for external access"""
         return {
             'total_devices': len(self.device_states),
-            'active_devices': len([d for d in self.device_states.values() if d.get('status') != DeviceStatus.OFF]),
+            'active_devices': self._active_device_count,
             'pending_commands': len(self.pending_commands),
             'scheduled_commands': len(self.scheduled_commands),
             'manual_overrides': len(self.manual_overrides),
             'controller_stats': self.controller_stats,
             'safety_systems_active': True
-        }
\ No newline at end of file
+        }
+    
+    def get_pending_commands(self) -> List[DeviceControlCommand]:
+        """Get pending commands in execution priority order"""
+        return [entry[-1] for entry in sorted(self.pending_commands)]
+    
+    def get_scheduled_commands(self) -> List[DeviceControlCommand]:
+        """Get future commands in scheduled time order"""
+        return [entry[-1] for entry in sorted(self.scheduled_commands)]
+    
+    # Message type -> handler; every handler takes (self, content, from_agent)
+    _MESSAGE_HANDLERS = {
+        MessageType.OPTIMIZATION_RESULT: _handle_optimization_schedule,
+        MessageType.MANUAL_OVERRIDE: _handle_manual_override,
+        MessageType.DEVICE_CONTROL: _handle_device_control_request,
+        MessageType.EMERGENCY_STOP: _handle_emergency_stop,
+        MessageType.SYSTEM_STATUS: _handle_status_request,
+        MessageType.HEALTH_CHECK: _handle_health_check_request,
+    }
+    
+    # Control action -> simulator; every simulator takes (self, command, current_power)
+    _ACTION_SIMULATORS = {
+        ControlAction.TURN_ON: _sim_turn_on,
+        ControlAction.TURN_OFF: _sim_turn_off,
+        ControlAction.SET_POWER: _sim_set_power,
+        ControlAction.REDUCE_POWER: _sim_reduce_power,
+        ControlAction.DELAY_OPERATION: _sim_delay_operation,
+    }
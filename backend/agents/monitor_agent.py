@@ -7,14 +7,91 @@ import random
 import asyncio
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
+from collections import deque
 import json
 
+from sqlalchemy import insert
+
 from .base_agent import BaseAgent, AgentStatus
 from core.message_broker import MessageType, MessagePriority, Message
 from core.database import Device, ConsumptionLog
 from core.config import settings
 
 
+# Device status values as stored in ConsumptionLog and sent to other agents
+_STATUS_OFF = 'off'
+_STATUS_STANDBY = 'standby'
+_STATUS_ON = 'on'
+
+
+# ===== SIMULATION PATTERNS =====
+# Each handler takes (device, hour, rng) and returns the simulated (consumption, status)
+
+def _pattern_temperature_dependent(device, hour: int, rng: random.Random):
+    """AC units - higher consumption in hot hours"""
+    base_consumption = device.power_watts
+    if 12 <= hour <= 18:  # Hot afternoon
+        return base_consumption * rng.uniform(0.8, 1.0), _STATUS_ON
+    if 19 <= hour <= 23:  # Evening
+        return base_consumption * rng.uniform(0.6, 0.8), _STATUS_ON
+    # Night/early morning
+    consumption = base_consumption * rng.uniform(0.1, 0.3)
+    return consumption, _STATUS_STANDBY if rng.random() > 0.7 else _STATUS_OFF
+
+
+def _pattern_schedule_based(device, hour: int, rng: random.Random):
+    """Lights, bedroom AC - based on typical schedules"""
+    if device.room == "bedroom" and (hour >= 22 or hour <= 6):  # Bedroom at night
+        return device.power_watts * rng.uniform(0.7, 1.0), _STATUS_ON
+    if 18 <= hour <= 23:  # Evening
+        return device.power_watts * rng.uniform(0.5, 0.8), _STATUS_ON
+    return device.power_watts * rng.uniform(0.0, 0.2), _STATUS_OFF
+
+
+def _pattern_constant(device, hour: int, rng: random.Random):
+    """Refrigerator - always on with minor variations"""
+    return device.power_watts * rng.uniform(0.8, 1.1), _STATUS_ON
+
+
+def _pattern_evening_peak(device, hour: int, rng: random.Random):
+    """TV & Entertainment - peak usage in evening"""
+    if 19 <= hour <= 23:
+        return device.power_watts * rng.uniform(0.8, 1.0), _STATUS_ON
+    if 7 <= hour <= 9:  # Morning news
+        return device.power_watts * rng.uniform(0.3, 0.5), _STATUS_ON
+    return device.power_watts * rng.uniform(0.0, 0.1), _STATUS_STANDBY
+
+
+def _pattern_manual(device, hour: int, rng: random.Random):
+    """Washing machine - random usage"""
+    if rng.random() < 0.1:  # 10% chance of being on
+        return device.power_watts * rng.uniform(0.8, 1.0), _STATUS_ON
+    return 0, _STATUS_OFF
+
+
+def _pattern_default(device, hour: int, rng: random.Random):
+    """Default pattern"""
+    consumption = device.power_watts * rng.uniform(0.3, 0.7)
+    return consumption, _STATUS_ON if consumption > device.power_watts * 0.1 else _STATUS_OFF
+
+
+# Anomaly thresholds for patterns whose normal swing exceeds the default; others use anomaly_threshold
+_PATTERN_ANOMALY_THRESHOLDS = {
+    "constant": 0.35,  # Simulated at 80-110% of rating, so 20% flags routine noise
+    "temperature_dependent": 0.25,
+    "manual": 0.5,
+}
+
+
+_PATTERN_HANDLERS = {
+    "temperature_dependent": _pattern_temperature_dependent,
+    "schedule_based": _pattern_schedule_based,
+    "constant": _pattern_constant,
+    "evening_peak": _pattern_evening_peak,
+    "manual": _pattern_manual,
+}
+
+
 class MonitorAgent(BaseAgent):
     """
     Monitor Agent - Tracks real-time energy consumption and detects anomalies
@@ -38,6 +115,27 @@ class MonitorAgent(BaseAgent):
         self.anomaly_threshold = 0.20  # 20% variance threshold
         self.simulation_patterns = {}
         
+        # Aggregates kept current by the cycle pass and status changes, so summaries never re-scan devices
+        self._total_consumption = 0
+        self._active_devices = 0
+        self._devices_status_cache = None  # Per-device status payload, rebuilt lazily after devices change
+        self._rng = random.Random()  # Agent-local generator for simulated readings
+        
+        # Consumption updates carry only changed devices, with a full snapshot every few cycles
+        self.snapshot_interval = 10
+        self._cycles_until_snapshot = 0
+        self._last_broadcast_state = {}  # device_id -> (power_watts, status) as last broadcast
+        
+        # Consumption rows are written by one background task; the cycle only enqueues them
+        self._write_queue: asyncio.Queue = asyncio.Queue(maxsize=32)  # Drained by _consumption_writer
+        self.max_write_batches = 10  # Queued cycles merged into one transaction under backlog
+        # Rows are held and handed over in larger batches, bounded by size and by a flush timer
+        self._pending_rows: List[Dict[str, Any]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.write_batch_rows = 500
+        # At most one monitor interval; the controller and optimizer read the latest ConsumptionLog rows
+        self.write_flush_interval = float(settings.agent_poll_interval)
+        
         # Monitoring statistics
         self.monitoring_stats = {
             'devices_monitored': 0,
@@ -62,6 +160,8 @@ class MonitorAgent(BaseAgent):
             # Initialize device history for anomaly detection
             self._initialize_device_history()
             
+            self._spawn(self._consumption_writer())
+            
             self.logger.info(f"Monitor Agent initialized with {len(self.devices)} devices")
             
         except Exception as e:
@@ -71,21 +171,29 @@ class MonitorAgent(BaseAgent):
     async def execute_cycle(self):
         """Execute one monitoring cycle"""
         try:
-            # Read all device consumptions
-            device_readings = await self._read_all_devices()
+            # One timestamp for the whole cycle: readings, stats and broadcasts all share it
+            now = datetime.utcnow()
+            
+            snapshot = self._cycles_until_snapshot <= 0
+            self._cycles_until_snapshot = self.snapshot_interval if snapshot else self._cycles_until_snapshot - 1
             
-            # Store readings in database
-            await self._store_consumption_data(device_readings)
+            # Read every device, build its log row and check it for anomalies in a single pass
+            device_readings, log_rows, anomalies, total_consumption, active_devices = self._process_devices(now, snapshot)
             
-            # Check for anomalies
-            anomalies = await self._detect_anomalies(device_readings)
+            # Hand readings to the background writer; the cycle never waits on SQLite
+            self._store_consumption_data(log_rows)
             
             # Broadcast consumption update to other agents
-            await self._broadcast_consumption_update(device_readings, anomalies)
+            await self._broadcast_consumption_update(
+                device_readings, anomalies, total_consumption, active_devices, now.isoformat(), snapshot
+            )
             
             # Update statistics
-            self.monitoring_stats['total_readings'] += len(device_readings)
-            self.monitoring_stats['last_reading_time'] = datetime.utcnow()
+            self._devices_status_cache = None
+            self._total_consumption = total_consumption
+            self._active_devices = active_devices
+            self.monitoring_stats['total_readings'] += len(log_rows)
+            self.monitoring_stats['last_reading_time'] = now
             
             if anomalies:
                 self.monitoring_stats['anomalies_detected'] += len(anomalies)
@@ -118,8 +226,23 @@ class MonitorAgent(BaseAgent):
     async def cleanup(self):
         """Cleanup agent resources"""
         self.logger.info("Cleaning up Monitor Agent resources")
+        
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        # The writer task is already cancelled; write out whatever it had not picked up
+        pending_rows = []
+        while not self._write_queue.empty():
+            pending_rows.extend(self._write_queue.get_nowait())
+        pending_rows.extend(self._pending_rows)
+        self._pending_rows = []
+        if pending_rows:
+            await asyncio.to_thread(self._sync_store_consumption_data, pending_rows)
+        
         self.devices.clear()
         self.device_history.clear()
+        self._last_broadcast_state.clear()
     
     def get_capabilities(self) -> List[str]:
         """Return agent capabilities"""
@@ -141,14 +264,20 @@ class MonitorAgent(BaseAgent):
         """Load devices from database"""
         session = self.get_db_session()
         try:
-            devices = session.query(Device).all()
+            # Only the columns the simulation reads; plain rows skip ORM instrumentation on every access
+            devices = session.query(
+                Device.id, Device.name, Device.power_watts, Device.usage_pattern, Device.room
+            ).all()
             for device in devices:
                 self.devices[device.id] = {
                     'device': device,
                     'current_power': 0,
-                    'current_status': 'off',
+                    'current_status': _STATUS_OFF,
                     'last_reading': None,
-                    'temperature': None  # For AC units
+                    'temperature': None,  # For AC units
+                    # Status cut-offs: under 5% of rated power is off, under 30% is standby
+                    'off_thresh': device.power_watts * 0.05,
+                    'standby_thresh': device.power_watts * 0.3
                 }
             
             self.monitoring_stats['devices_monitored'] = len(self.devices)
@@ -160,86 +289,52 @@ class MonitorAgent(BaseAgent):
     def _initialize_simulation_patterns(self):
         """Initialize realistic consumption patterns for each device"""
         current_hour = datetime.now().hour
+        now = datetime.utcnow()
+        rng = self._rng
         
         for device_id, device_data in self.devices.items():
             device = device_data['device']
-            pattern = device.usage_pattern
-            
-            if pattern == "temperature_dependent":
-                # AC units - higher consumption in hot hours
-                base_consumption = device.power_watts
-                if 12 <= current_hour <= 18:  # Hot afternoon
-                    consumption = base_consumption * random.uniform(0.8, 1.0)
-                    status = 'on'
-                elif 19 <= current_hour <= 23:  # Evening
-                    consumption = base_consumption * random.uniform(0.6, 0.8)
-                    status = 'on' 
-                else:  # Night/early morning
-                    consumption = base_consumption * random.uniform(0.1, 0.3)
-                    status = 'standby' if random.random() > 0.7 else 'off'
-                    
-            elif pattern == "schedule_based":
-                # Lights, bedroom AC - based on typical schedules
-                if device.room == "bedroom" and 22 <= current_hour or current_hour <= 6:
-                    consumption = device.power_watts * random.uniform(0.7, 1.0)
-                    status = 'on'
-                elif 18 <= current_hour <= 23:  # Evening
-                    consumption = device.power_watts * random.uniform(0.5, 0.8)
-                    status = 'on'
-                else:
-                    consumption = device.power_watts * random.uniform(0.0, 0.2)
-                    status = 'off'
-                    
-            elif pattern == "constant":
-                # Refrigerator - always on with minor variations
-                consumption = device.power_watts * random.uniform(0.8, 1.1)
-                status = 'on'
-                
-            elif pattern == "evening_peak":
-                # TV & Entertainment - peak usage in evening
-                if 19 <= current_hour <= 23:
-                    consumption = device.power_watts * random.uniform(0.8, 1.0)
-                    status = 'on'
-                elif 7 <= current_hour <= 9:  # Morning news
-                    consumption = device.power_watts * random.uniform(0.3, 0.5)
-                    status = 'on'
-                else:
-                    consumption = device.power_watts * random.uniform(0.0, 0.1)
-                    status = 'standby'
-                    
-            elif pattern == "manual":
-                # Washing machine - random usage
-                if random.random() < 0.1:  # 10% chance of being on
-                    consumption = device.power_watts * random.uniform(0.8, 1.0)
-                    status = 'on'
-                else:
-                    consumption = 0
-                    status = 'off'
-            else:
-                # Default pattern
-                consumption = device.power_watts * random.uniform(0.3, 0.7)
-                status = 'on' if consumption > device.power_watts * 0.1 else 'off'
+            handler = _PATTERN_HANDLERS.get(device.usage_pattern, _pattern_default)
+            consumption, status = handler(device, current_hour, rng)
             
             # Store simulation state
             self.simulation_patterns[device_id] = {
                 'base_consumption': consumption,
                 'status': status,
-                'last_update': datetime.utcnow()
+                'last_update': now
             }
     
     def _initialize_device_history(self):
         """Initialize device history for anomaly detection"""
-        for device_id in self.devices.keys():
+        for device_id, device_data in self.devices.items():
+            pattern = device_data['device'].usage_pattern
             self.device_history[device_id] = {
-                'readings': [],
+                'readings': deque(maxlen=10),  # Last 10 readings; the oldest drops off on append
+                'readings_total': 0,  # Running sum of 'readings', kept in step on every add/drop
+                'anomaly_threshold': _PATTERN_ANOMALY_THRESHOLDS.get(pattern, self.anomaly_threshold),
                 'average_consumption': 0,
                 'last_anomaly': None
             }
     
-    async def _read_all_devices(self) -> Dict[str, Dict[str, Any]]:
-        """Simulate reading consumption from all devices"""
-        readings = {}
-        current_time = datetime.utcnow()
+    def _process_devices(self, current_time: datetime, snapshot: bool):
+        """Simulate, record and anomaly-check every device in one pass
+        
+        Returns (readings, log_rows, anomalies, total_consumption_watts, active_devices), where
+        readings is columnar: one list per field, indexed alike across device_ids. Unless snapshot
+        is set, readings only holds devices whose power or status changed since the last broadcast.
+        """
+        device_ids = []
+        device_names = []
+        power_column = []
+        status_column = []
+        temperature_column = []
+        efficiency_column = []
+        log_rows = []
+        anomalies = []
+        total_consumption = 0
+        active_devices = 0
+        uniform = self._rng.uniform  # Bound once for the per-device draws below
+        last_broadcast_state = self._last_broadcast_state
         
         for device_id, device_data in self.devices.items():
             device = device_data['device']
@@ -247,63 +342,134 @@ class MonitorAgent(BaseAgent):
             # Get simulated consumption based on patterns
             pattern_data = self.simulation_patterns.get(device_id, {})
             
-            # Add some random variation to make it realistic
             base_consumption = pattern_data.get('base_consumption', device.power_watts * 0.5)
-            variation = random.uniform(0.95, 1.05)  # ±5% random variation
-            current_consumption = max(0, int(base_consumption * variation))
-            
-            # Determine status
-            status = pattern_data.get('status', 'on')
-            if current_consumption < device.power_watts * 0.05:
-                status = 'off'
-            elif current_consumption < device.power_watts * 0.3:
-                status = 'standby'
-            
-            # For AC units, simulate temperature
-            temperature = None
-            if device.usage_pattern == "temperature_dependent":
-                if status == 'on':
-                    temperature = random.uniform(20, 26)  # Target temperature range
-                else:
-                    temperature = random.uniform(26, 32)  # Ambient temperature
-            
-            readings[device_id] = {
+            temperature_dependent = device.usage_pattern == "temperature_dependent"
+            
+            if not base_consumption and not temperature_dependent and device_data['off_thresh'] > 0:
+                # Switched off with no base load: the reading is always 0W off, so skip the random draws
+                current_consumption = 0
+                status = _STATUS_OFF
+                is_on = False
+                temperature = None
+                efficiency_rating = None
+            else:
+                # Add some random variation to make it realistic
+                variation = uniform(0.95, 1.05)  # ±5% random variation
+                current_consumption = max(0, int(base_consumption * variation))
+                
+                # Determine status
+                status = pattern_data.get('status', _STATUS_ON)
+                if current_consumption < device_data['off_thresh']:
+                    status = _STATUS_OFF
+                elif current_consumption < device_data['standby_thresh']:
+                    status = _STATUS_STANDBY
+                
+                is_on = status == _STATUS_ON
+                
+                # For AC units, simulate temperature
+                temperature = None
+                if temperature_dependent:
+                    if is_on:
+                        temperature = uniform(20, 26)  # Target temperature range
+                    else:
+                        temperature = uniform(26, 32)  # Ambient temperature
+                
+                efficiency_rating = uniform(0.8, 1.0) if is_on else None
+            
+            broadcast_state = (current_consumption, status)
+            if snapshot or last_broadcast_state.get(device_id) != broadcast_state:
+                last_broadcast_state[device_id] = broadcast_state
+                device_ids.append(device_id)
+                device_names.append(device.name)
+                power_column.append(current_consumption)
+                status_column.append(status)
+                temperature_column.append(temperature)
+                efficiency_column.append(efficiency_rating)
+            log_rows.append({
                 'device_id': device_id,
-                'device_name': device.name,
                 'power_watts': current_consumption,
                 'status': status,
                 'temperature': temperature,
-                'timestamp': current_time,
-                'efficiency_rating': random.uniform(0.8, 1.0) if status == 'on' else None
-            }
+                'efficiency_rating': efficiency_rating,
+                'timestamp': current_time
+            })
+            
+            total_consumption += current_consumption
+            if is_on:
+                active_devices += 1
             
             # Update device state
-            self.devices[device_id].update({
-                'current_power': current_consumption,
-                'current_status': status,
-                'last_reading': current_time,
-                'temperature': temperature
-            })
+            device_data['current_power'] = current_consumption
+            device_data['current_status'] = status
+            device_data['last_reading'] = current_time
+            device_data['temperature'] = temperature
+            
+            anomaly = self._check_anomaly(device_id, device.name, current_consumption, current_time)
+            if anomaly:
+                anomalies.append(anomaly)
+        
+        readings = {
+            'device_ids': device_ids,
+            'device_names': device_names,
+            'power_watts': power_column,
+            'status': status_column,
+            'temperature': temperature_column,
+            'efficiency_rating': efficiency_column
+        }
+        
+        return readings, log_rows, anomalies, total_consumption, active_devices
+    
+    def _store_consumption_data(self, log_rows: List[Dict[str, Any]]):
+        """Accumulate consumption readings and queue them for the background writer in batches"""
+        if self._flush_handle is None:
+            # The oldest pending reading waits at most one flush interval, even if no cycle follows
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self.write_flush_interval, self._flush_pending_rows
+            )
+        self._pending_rows.extend(log_rows)
+        
+        if len(self._pending_rows) >= self.write_batch_rows:
+            self._flush_pending_rows()
+    
+    def _flush_pending_rows(self):
+        """Queue pending readings for the writer; on a full queue keep them and retry after the interval"""
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending_rows:
+            return
         
-        return readings
+        try:
+            self._write_queue.put_nowait(self._pending_rows)
+        except asyncio.QueueFull:
+            # Later readings merge into the same batch rather than being dropped
+            self.logger.warning(f"Consumption write queue full, holding {len(self._pending_rows)} readings")
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self.write_flush_interval, self._flush_pending_rows
+            )
+            return
+        self._pending_rows = []
     
-    async def _store_consumption_data(self, readings: Dict[str, Dict[str, Any]]):
-        """Store consumption readings in database"""
+    async def _consumption_writer(self):
+        """Single consumer that stores queued readings off the event loop, merging any backlog into one transaction"""
+        while True:
+            log_rows = await self._write_queue.get()
+            merged = 1
+            while merged < self.max_write_batches and not self._write_queue.empty():
+                log_rows.extend(self._write_queue.get_nowait())
+                merged += 1
+            
+            await asyncio.to_thread(self._sync_store_consumption_data, log_rows)
+    
+    def _sync_store_consumption_data(self, log_rows: List[Dict[str, Any]]):
+        """Insert consumption rows in one transaction on a session of its own"""
         session = self.get_db_session()
         try:
-            for reading in readings.values():
-                log_entry = ConsumptionLog(
-                    device_id=reading['device_id'],
-                    power_watts=reading['power_watts'],
-                    status=reading['status'],
-                    temperature=reading['temperature'],
-                    efficiency_rating=reading['efficiency_rating'],
-                    timestamp=reading['timestamp']
-                )
-                session.add(log_entry)
+            # One Core INSERT executemany; no ORM objects or unit-of-work bookkeeping per row
+            session.execute(insert(ConsumptionLog.__table__), log_rows)
             
             session.commit()
-            self.logger.debug(f"Stored {len(readings)} consumption readings")
+            self.logger.debug(f"Stored {len(log_rows)} consumption readings")
             
         except Exception as e:
             self.logger.error(f"Failed to store consumption data: {e}")
@@ -311,69 +477,70 @@ class MonitorAgent(BaseAgent):
         finally:
             session.close()
     
-    async def _detect_anomalies(self, readings: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Detect consumption anomalies (>20% variance from average)"""
-        anomalies = []
+    def _check_anomaly(self, device_id: str, device_name: str, current_consumption: int,
+                       timestamp: datetime) -> Optional[Dict[str, Any]]:
+        """Record a reading in the device's rolling window and flag it if too far off the average"""
+        device_history = self.device_history[device_id]
+        history = device_history['readings']
         
-        for device_id, reading in readings.items():
-            device_history = self.device_history[device_id]
-            current_consumption = reading['power_watts']
-            
-            # Add current reading to history
-            device_history['readings'].append(current_consumption)
-            
-            # Keep only last 10 readings for rolling average
-            if len(device_history['readings']) > 10:
-                device_history['readings'] = device_history['readings'][-10:]
-            
-            # Calculate average (need at least 3 readings)
-            if len(device_history['readings']) >= 3:
-                average = sum(device_history['readings']) / len(device_history['readings'])
-                device_history['average_consumption'] = average
-                
-                # Check for anomaly (>20% variance)
-                if average > 0:
-                    variance = abs(current_consumption - average) / average
-                    
-                    if variance > self.anomaly_threshold:
-                        anomaly = {
-                            'device_id': device_id,
-                            'device_name': reading['device_name'],
-                            'current_consumption': current_consumption,
-                            'average_consumption': average,
-                            'variance_percentage': variance * 100,
-                            'timestamp': reading['timestamp'],
-                            'severity': 'high' if variance > 0.5 else 'medium'
-                        }
-                        
-                        anomalies.append(anomaly)
-                        device_history['last_anomaly'] = datetime.utcnow()
-                        
-                        self.logger.warning(
-                            f"Anomaly detected on {reading['device_name']}: "
-                            f"{current_consumption}W vs {average:.0f}W avg "
-                            f"({variance*100:.1f}% variance)"
-                        )
+        # Add current reading to history; a full window evicts its oldest reading
+        if len(history) == history.maxlen:
+            device_history['readings_total'] -= history[0]
+        history.append(current_consumption)
+        device_history['readings_total'] += current_consumption
+        
+        # Calculate average (need at least 3 readings); the running total avoids re-summing the window
+        count = len(history)
+        if count < 3:
+            return None
+        
+        average = device_history['readings_total'] / count
+        device_history['average_consumption'] = average
+        
+        # Check for anomaly (variance beyond the device's pattern threshold)
+        if average <= 0:
+            return None
+        
+        variance = abs(current_consumption - average) / average
+        if variance <= device_history['anomaly_threshold']:
+            return None
+        
+        device_history['last_anomaly'] = timestamp
+        
+        self.logger.warning(
+            f"Anomaly detected on {device_name}: "
+            f"{current_consumption}W vs {average:.0f}W avg "
+            f"({variance*100:.1f}% variance)"
+        )
         
-        return anomalies
+        return {
+            'device_id': device_id,
+            'device_name': device_name,
+            'current_consumption': current_consumption,
+            'average_consumption': average,
+            'variance_percentage': variance * 100,
+            'timestamp': timestamp.isoformat(),
+            'severity': 'high' if variance > 0.5 else 'medium'
+        }
     
-    async def _broadcast_consumption_update(self, readings: Dict[str, Dict[str, Any]], anomalies: List[Dict[str, Any]]):
+    async def _broadcast_consumption_update(self, readings: Dict[str, List[Any]], anomalies: List[Dict[str, Any]],
+                                            total_consumption: int, active_devices: int, timestamp: str,
+                                            snapshot: bool):
         """Broadcast consumption update to other agents"""
         try:
-            # Calculate total consumption
-            total_consumption = sum(reading['power_watts'] for reading in readings.values())
-            active_devices = len([r for r in readings.values() if r['status'] == 'on'])
-            
             # Prepare message content
             content = {
-                'timestamp': datetime.utcnow().isoformat(),
+                'timestamp': timestamp,
                 'total_consumption_watts': total_consumption,
                 'active_devices': active_devices,
-                'device_count': len(readings),
-                'readings': list(readings.values()),
-                'anomalies': anomalies,
-                'monitoring_stats': self.monitoring_stats
+                'device_count': len(self.devices),
+                # Columnar and timestamped by the message; a snapshot lists every device, otherwise only changes
+                'snapshot': snapshot,
+                'readings': readings,
+                'anomalies': anomalies
             }
+            if snapshot:
+                content['monitoring_stats'] = self._stats_snapshot()
             
             # Broadcast to all agents
             await self.broadcast_message(
@@ -387,7 +554,7 @@ class MonitorAgent(BaseAgent):
                 await self.broadcast_message(
                     MessageType.ANOMALY_DETECTED,
                     {
-                        'timestamp': datetime.utcnow().isoformat(),
+                        'timestamp': timestamp,
                         'anomaly_count': len(anomalies),
                         'anomalies': anomalies,
                         'total_consumption': total_consumption
@@ -400,6 +567,13 @@ class MonitorAgent(BaseAgent):
         except Exception as e:
             self.logger.error(f"Failed to broadcast consumption update: {e}")
     
+    def _stats_snapshot(self) -> Dict[str, Any]:
+        """Copy of monitoring_stats with the timestamp pre-formatted so the payload is JSON-ready"""
+        stats = dict(self.monitoring_stats)
+        if stats['last_reading_time'] is not None:
+            stats['last_reading_time'] = stats['last_reading_time'].isoformat()
+        return stats
+    
     async def _handle_device_status_change(self, content: Dict[str, Any]):
         """Handle device status change from Controller Agent"""
         try:
@@ -407,17 +581,22 @@ class MonitorAgent(BaseAgent):
             new_status = content.get('status')
             
             if device_id in self.devices:
-                self.devices[device_id]['current_status'] = new_status
+                device_data = self.devices[device_id]
+                was_on = device_data['current_status'] == _STATUS_ON
+                if was_on != (new_status == _STATUS_ON):
+                    self._active_devices += -1 if was_on else 1
+                device_data['current_status'] = new_status
+                self._devices_status_cache = None
                 self.logger.info(f"Updated device {device_id} status to {new_status}")
                 
                 # Update simulation pattern
                 if device_id in self.simulation_patterns:
                     pattern = self.simulation_patterns[device_id]
-                    if new_status == 'off':
+                    if new_status == _STATUS_OFF:
                         pattern['base_consumption'] = 0
-                    elif new_status == 'on':
+                    elif new_status == _STATUS_ON:
                         device = self.devices[device_id]['device']
-                        pattern['base_consumption'] = device.power_watts * random.uniform(0.8, 1.0)
+                        pattern['base_consumption'] = device.power_watts * self._rng.uniform(0.8, 1.0)
                     
                     pattern['status'] = new_status
                     pattern['last_update'] = datetime.utcnow()
@@ -452,16 +631,8 @@ class MonitorAgent(BaseAgent):
         try:
             status_data = {
                 'agent_name': self.agent_name,
-                'monitoring_stats': self.monitoring_stats,
-                'devices_status': {
-                    device_id: {
-                        'name': data['device'].name,
-                        'current_power': data['current_power'],
-                        'status': data['current_status'],
-                        'last_reading': data['last_reading'].isoformat() if data['last_reading'] else None
-                    }
-                    for device_id, data in self.devices.items()
-                },
+                'monitoring_stats': self._stats_snapshot(),
+                'devices_status': self._devices_status(),
                 'agent_health': self.get_status()
             }
             
@@ -475,19 +646,26 @@ class MonitorAgent(BaseAgent):
         except Exception as e:
             self.logger.error(f"Failed to send monitoring status: {e}")
     
+    def _devices_status(self) -> Dict[str, Dict[str, Any]]:
+        """Per-device status payload, shared by every status reply until the devices next change"""
+        # Replaced rather than mutated on change, so messages already holding it stay consistent
+        if self._devices_status_cache is None:
+            self._devices_status_cache = {
+                device_id: {
+                    'name': data['device'].name,
+                    'current_power': data['current_power'],
+                    'status': data['current_status'],
+                    'last_reading': data['last_reading'].isoformat() if data['last_reading'] else None
+                }
+                for device_id, data in self.devices.items()
+            }
+        return self._devices_status_cache
+    
     def get_current_consumption_summary(self) -> Dict[str, Any]:
         """Get current consumption summary for external access"""
-        total_consumption = sum(
-            data['current_power'] for data in self.devices.values()
-        )
-        active_devices = len([
-            data for data in self.devices.values() 
-            if data['current_status'] == 'on'
-        ])
-        
         return {
-            'total_consumption_watts': total_consumption,
-            'active_devices': active_devices,
+            'total_consumption_watts': self._total_consumption,
+            'active_devices': self._active_devices,
             'device_count': len(self.devices),
             'last_update': self.monitoring_stats['last_reading_time'],
             'monitoring_stats': self.monitoring_stats
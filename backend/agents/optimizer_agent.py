@@ -5,17 +5,25 @@ Cost optimization and intelligent scheduling for energy efficiency
 
 import asyncio
 import json
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta, time, timezone
 from typing import Dict, Any, List, Optional, Tuple
+from collections import deque
 import math
 from dataclasses import dataclass
 
+from sqlalchemy import and_, func, insert
+
 from .base_agent import BaseAgent, AgentStatus
 from core.message_broker import MessageType, MessagePriority, Message
 from core.database import OptimizationResult, Device, ConsumptionLog
 from core.config import settings, get_current_pricing_tier, calculate_energy_cost
 
 
+def _shift_savings_dh(power_watts: float, rate_from: float, rate_to: float = 0.0) -> float:
+    """Hourly cost saved by moving power_watts from a rate_from hour to a rate_to hour (0 = removed)"""
+    return power_watts * (rate_from - rate_to) * 0.001
+
+
 @dataclass
 class OptimizationSchedule:
     """Data class for device optimization schedule"""
@@ -65,6 +73,10 @@ class OptimizerAgent(BaseAgent):
         
         # Energy pricing data
         self.pricing_tiers = settings.energy_pricing
+        self._peak_rate = self.pricing_tiers['peak']['rate_dh_kwh']
+        self._off_peak_rate = self.pricing_tiers['off_peak']['rate_dh_kwh']
+        # Pricing is static after startup, so resolve each hour's rate once
+        self._rate_by_hour = [get_current_pricing_tier(hour)['rate'] for hour in range(24)]
         self.monthly_base_fee = settings.monthly_base_fee_dh
         
         # Device priority weights
@@ -78,8 +90,13 @@ class OptimizerAgent(BaseAgent):
         # Optimization constraints
         self.max_delay_hours = 4  # Maximum delay for low-priority devices
         self.comfort_temp_range = (20, 26)  # Acceptable temperature range
-        self.peak_hours = self.pricing_tiers['peak']['hours']
-        self.off_peak_hours = self.pricing_tiers['off_peak']['hours']
+        self.peak_hours = frozenset(self.pricing_tiers['peak']['hours'])
+        self.off_peak_hours = frozenset(self.pricing_tiers['off_peak']['hours'])
+        # Hour of day -> first off-peak hour at or after it (None without off-peak hours)
+        self._next_off_peak_hour = [
+            next(((hour + offset) % 24 for offset in range(24) if (hour + offset) % 24 in self.off_peak_hours), None)
+            for hour in range(24)
+        ]
         
         # Performance metrics
         self.optimization_stats = {
@@ -90,8 +107,17 @@ class OptimizerAgent(BaseAgent):
             'last_optimization_time': None
         }
         
+        # Message-triggered optimizations are debounced so a burst of triggers runs one cycle
+        self.trigger_debounce = 2.0
+        self._trigger_handle: Optional[asyncio.TimerHandle] = None
+        self._cycle_lock = asyncio.Lock()  # Scheduled and triggered cycles never overlap
+        
         # Learning data for future improvements
-        self.historical_performance = []
+        self.historical_performance = deque(maxlen=100)  # Last 100 performance records; oldest drop off
+        
+        # Typical-day forecast entries per hour of day, rotated to start at the current hour on demand
+        self._forecast_by_hour = [self._typical_hour_forecast(hour) for hour in range(24)]
+        self._forecast_cache: Optional[Tuple[int, Dict[str, Any]]] = None  # (hour, forecast)
         
         self.logger.info("Optimizer Agent initialized")
     
@@ -114,47 +140,60 @@ class OptimizerAgent(BaseAgent):
     
     async def execute_cycle(self):
         """Execute one optimization cycle"""
+        async with self._cycle_lock:
+            await self._run_optimization_cycle()
+    
+    async def _run_optimization_cycle(self):
+        """Analyze consumption, generate a schedule and send it out"""
         try:
             if not self.optimization_enabled:
                 self.logger.debug("Optimization disabled, skipping cycle")
                 return
             
+            # One clock reading for the whole cycle: UTC for timestamps and schedule times, and its
+            # local hour for the tariff and forecast, whose hours are local as in the controller
+            now = datetime.utcnow()
+            local_hour = now.replace(tzinfo=timezone.utc).astimezone().hour
+            
             # Get current consumption data
-            consumption_data = await self._get_current_consumption_data()
+            consumption_data = await self._get_current_consumption_data(now)
             
             if not consumption_data:
                 self.logger.warning("No consumption data available for optimization")
                 return
             
             # Get weather forecast for energy predictions
-            weather_data = await self._get_weather_forecast()
+            weather_data = await self._get_weather_forecast(local_hour)
             
             # Perform cost analysis
-            cost_analysis = await self._analyze_current_costs(consumption_data)
+            cost_analysis = await self._analyze_current_costs(consumption_data, local_hour)
             
             # Generate optimization schedule
             optimization_schedule = await self._generate_optimization_schedule(
-                consumption_data, weather_data, cost_analysis
+                consumption_data, weather_data, cost_analysis, now
             )
             
             # Calculate potential savings
             savings_analysis = await self._calculate_savings_potential(
-                consumption_data, optimization_schedule
+                consumption_data, optimization_schedule, local_hour
             )
             
-            # Send optimization results to Controller Agent
+            # Send to Controller Agent, broadcast status and store results concurrently;
+            # the three are independent, so the cycle waits for the slowest instead of the sum
+            outputs = {}
             if optimization_schedule:
-                await self._send_optimization_to_controller(optimization_schedule, savings_analysis)
-            
-            # Broadcast optimization status to all agents
-            await self._broadcast_optimization_status(cost_analysis, savings_analysis)
+                outputs['send'] = self._send_optimization_to_controller(optimization_schedule, savings_analysis, now)
+            outputs['broadcast'] = self._broadcast_optimization_status(cost_analysis, savings_analysis, now)
+            outputs['store'] = self._store_optimization_results(cost_analysis, savings_analysis)
             
-            # Store optimization results
-            await self._store_optimization_results(cost_analysis, savings_analysis)
+            results = await asyncio.gather(*outputs.values(), return_exceptions=True)
+            for name, result in zip(outputs, results):
+                if isinstance(result, Exception):
+                    self.logger.error(f"Optimization output '{name}' failed: {result}")
             
             # Update statistics
             self.optimization_stats['optimizations_performed'] += 1
-            self.optimization_stats['last_optimization_time'] = datetime.utcnow()
+            self.optimization_stats['last_optimization_time'] = now
             
             if savings_analysis.savings_dh > 0:
                 self.optimization_stats['total_savings_calculated'] += savings_analysis.savings_dh
@@ -195,6 +234,9 @@ class OptimizerAgent(BaseAgent):
     async def cleanup(self):
         """Cleanup agent resources"""
         self.logger.info("Cleaning up Optimizer Agent resources")
+        if self._trigger_handle:
+            self._trigger_handle.cancel()
+            self._trigger_handle = None
         self.current_schedule.clear()
         self.historical_performance.clear()
     
@@ -215,20 +257,29 @@ class OptimizerAgent(BaseAgent):
     
     # ===== OPTIMIZATION CORE METHODS =====
     
-    async def _get_current_consumption_data(self) -> Optional[Dict[str, Any]]:
+    async def _get_current_consumption_data(self, now: datetime) -> Optional[Dict[str, Any]]:
         """Get current consumption data from database"""
         try:
             session = self.get_db_session()
             try:
-                # Get latest consumption for each device
-                devices = session.query(Device).all()
+                # Get latest consumption for each device in one query: newest timestamp per device, joined back
+                latest = session.query(
+                    ConsumptionLog.device_id,
+                    func.max(ConsumptionLog.timestamp).label('latest_timestamp')
+                ).group_by(ConsumptionLog.device_id).subquery()
+                
+                rows = session.query(Device, ConsumptionLog).join(
+                    latest, latest.c.device_id == Device.id
+                ).join(
+                    ConsumptionLog,
+                    and_(
+                        ConsumptionLog.device_id == latest.c.device_id,
+                        ConsumptionLog.timestamp == latest.c.latest_timestamp
+                    )
+                ).all()
                 device_data = {}
                 
-                for device in devices:
-                    latest_log = session.query(ConsumptionLog).filter(
-                        ConsumptionLog.device_id == device.id
-                    ).order_by(ConsumptionLog.timestamp.desc()).first()
-                    
+                for device, latest_log in rows:
                     if latest_log:
                         device_data[device.id] = {
                             'device': device,
@@ -244,7 +295,7 @@ class OptimizerAgent(BaseAgent):
                     return {
                         'devices': device_data,
                         'total_consumption': total_consumption,
-                        'timestamp': datetime.utcnow()
+                        'timestamp': now
                     }
                 
             finally:
@@ -255,39 +306,41 @@ class OptimizerAgent(BaseAgent):
         
         return None
     
-    async def _get_weather_forecast(self) -> Optional[Dict[str, Any]]:
+    async def _get_weather_forecast(self, current_hour: int) -> Optional[Dict[str, Any]]:
         """Get weather forecast data (simplified for optimization)"""
         # In a real implementation, this would get data from Weather Agent
         # For now, we'll use basic temperature assumptions
-        current_hour = datetime.now().hour
+        
+        # The forecast only changes when the hour rolls over
+        if self._forecast_cache and self._forecast_cache[0] == current_hour:
+            return self._forecast_cache[1]
         
         # Predict next 24 hours based on typical patterns
-        forecast = []
-        for i in range(24):
-            hour = (current_hour + i) % 24
-            if 6 <= hour <= 18:  # Daytime
-                temp = 25 + 5 * math.sin((hour - 6) * math.pi / 12)
-            else:  # Nighttime
-                temp = 20 - 3 * math.cos((hour - 18) * math.pi / 12)
-            
-            forecast.append({
-                'hour': hour,
-                'temperature': temp,
-                'cooling_needed': temp > 24,
-                'heating_needed': temp < 18
-            })
+        forecast = {'forecast': self._forecast_by_hour[current_hour:] + self._forecast_by_hour[:current_hour]}
+        self._forecast_cache = (current_hour, forecast)
+        return forecast
+    
+    @staticmethod
+    def _typical_hour_forecast(hour: int) -> Dict[str, Any]:
+        """Forecast entry for one hour of a typical day"""
+        if 6 <= hour <= 18:  # Daytime
+            temp = 25 + 5 * math.sin((hour - 6) * math.pi / 12)
+        else:  # Nighttime
+            temp = 20 - 3 * math.cos((hour - 18) * math.pi / 12)
         
-        return {'forecast': forecast}
+        return {
+            'hour': hour,
+            'temperature': temp,
+            'cooling_needed': temp > 24,
+            'heating_needed': temp < 18
+        }
     
-    async def _analyze_current_costs(self, consumption_data: Dict[str, Any]) -> CostAnalysis:
+    async def _analyze_current_costs(self, consumption_data: Dict[str, Any], current_hour: int) -> CostAnalysis:
         """Analyze current energy costs and identify optimization opportunities"""
         try:
-            current_hour = datetime.now().hour
-            current_pricing = get_current_pricing_tier(current_hour)
-            
             # Calculate current hourly cost
             total_consumption_kw = consumption_data['total_consumption'] / 1000
-            current_hourly_cost = total_consumption_kw * current_pricing['rate']
+            current_hourly_cost = total_consumption_kw * self._rate_by_hour[current_hour]
             
             # Project daily cost based on current consumption
             daily_cost = current_hourly_cost * 24
@@ -315,11 +368,12 @@ class OptimizerAgent(BaseAgent):
     async def _generate_optimization_schedule(self, 
                                             consumption_data: Dict[str, Any],
                                             weather_data: Dict[str, Any],
-                                            cost_analysis: CostAnalysis) -> List[OptimizationSchedule]:
+                                            cost_analysis: CostAnalysis,
+                                            now: datetime) -> List[OptimizationSchedule]:
         """Generate optimal device schedule based on pricing and consumption"""
         try:
             schedule = []
-            current_time = datetime.utcnow()
+            current_time = now
             devices = consumption_data['devices']
             
             for device_id, device_data in devices.items():
@@ -336,7 +390,7 @@ class OptimizerAgent(BaseAgent):
                     continue
                 
                 # Generate optimization recommendations based on device type
-                optimization = await self._optimize_device_schedule(
+                optimization = self._optimize_device_schedule(
                     device, device_data, weather_data, current_time
                 )
                 
@@ -353,40 +407,28 @@ class OptimizerAgent(BaseAgent):
             self.logger.error(f"Error generating optimization schedule: {e}")
             return []
     
-    async def _optimize_device_schedule(self,
-                                      device: Device,
-                                      device_data: Dict[str, Any],
-                                      weather_data: Dict[str, Any],
-                                      current_time: datetime) -> Optional[OptimizationSchedule]:
+    def _optimize_device_schedule(self,
+                                  device: Device,
+                                  device_data: Dict[str, Any],
+                                  weather_data: Dict[str, Any],
+                                  current_time: datetime) -> Optional[OptimizationSchedule]:
         """Optimize schedule for a specific device"""
         try:
-            current_hour = current_time.hour
-            current_power = device_data['current_power']
-            
-            # Device-specific optimization logic
-            if device.usage_pattern == "temperature_dependent":
-                return await self._optimize_hvac_device(device, device_data, weather_data, current_time)
-            
-            elif device.usage_pattern == "manual" and device.priority == "low":
-                return await self._optimize_deferrable_device(device, device_data, current_time)
-            
-            elif device.usage_pattern == "evening_peak":
-                return await self._optimize_entertainment_device(device, device_data, current_time)
-            
-            elif device.usage_pattern == "schedule_based":
-                return await self._optimize_scheduled_device(device, device_data, current_time)
-            
-            return None
+            # Device-specific optimization logic, selected by usage pattern
+            optimizer = self._DEVICE_OPTIMIZERS.get(device.usage_pattern)
+            if optimizer is None:
+                return None
+            return optimizer(self, device, device_data, weather_data, current_time)
             
         except Exception as e:
             self.logger.error(f"Error optimizing device {device.id}: {e}")
             return None
     
-    async def _optimize_hvac_device(self,
-                                   device: Device,
-                                   device_data: Dict[str, Any],
-                                   weather_data: Dict[str, Any],
-                                   current_time: datetime) -> Optional[OptimizationSchedule]:
+    def _optimize_hvac_device(self,
+                              device: Device,
+                              device_data: Dict[str, Any],
+                              weather_data: Dict[str, Any],
+                              current_time: datetime) -> Optional[OptimizationSchedule]:
         """Optimize HVAC devices based on temperature and pricing"""
         current_hour = current_time.hour
         current_power = device_data['current_power']
@@ -396,7 +438,7 @@ class OptimizerAgent(BaseAgent):
             # Peak hours - reduce HVAC usage if possible
             if current_power > device.power_watts * 0.5:
                 target_power = int(device.power_watts * 0.7)  # Reduce to 70%
-                estimated_savings = (current_power - target_power) / 1000 * self.pricing_tiers['peak']['rate_dh_kwh']
+                estimated_savings = _shift_savings_dh(current_power - target_power, self._peak_rate)
                 
                 return OptimizationSchedule(
                     device_id=device.id,
@@ -428,11 +470,16 @@ class OptimizerAgent(BaseAgent):
         
         return None
     
-    async def _optimize_deferrable_device(self,
-                                        device: Device,
-                                        device_data: Dict[str, Any],
-                                        current_time: datetime) -> Optional[OptimizationSchedule]:
+    def _optimize_deferrable_device(self,
+                                    device: Device,
+                                    device_data: Dict[str, Any],
+                                    weather_data: Dict[str, Any],
+                                    current_time: datetime) -> Optional[OptimizationSchedule]:
         """Optimize deferrable devices like washing machine"""
+        # Only low-priority manual devices can be deferred
+        if device.priority != "low":
+            return None
+        
         current_hour = current_time.hour
         current_power = device_data['current_power']
         
@@ -440,17 +487,13 @@ class OptimizerAgent(BaseAgent):
         if current_hour in self.peak_hours and current_power > 100:
             # Calculate next off-peak time
             next_off_peak = None
-            for hour in range(24):
-                check_hour = (current_hour + hour) % 24
-                if check_hour in self.off_peak_hours:
-                    next_off_peak = current_time.replace(hour=check_hour, minute=0) + timedelta(days=1 if check_hour <= current_hour else 0)
-                    break
+            check_hour = self._next_off_peak_hour[current_hour]
+            if check_hour is not None:
+                next_off_peak = current_time.replace(hour=check_hour, minute=0) + timedelta(days=1 if check_hour <= current_hour else 0)
             
             if next_off_peak:
                 # Calculate savings from peak to off-peak shift
-                peak_cost = current_power / 1000 * self.pricing_tiers['peak']['rate_dh_kwh']
-                off_peak_cost = current_power / 1000 * self.pricing_tiers['off_peak']['rate_dh_kwh']
-                estimated_savings = peak_cost - off_peak_cost
+                estimated_savings = _shift_savings_dh(current_power, self._peak_rate, self._off_peak_rate)
                 
                 return OptimizationSchedule(
                     device_id=device.id,
@@ -465,10 +508,11 @@ class OptimizerAgent(BaseAgent):
         
         return None
     
-    async def _optimize_entertainment_device(self,
-                                           device: Device,
-                                           device_data: Dict[str, Any],
-                                           current_time: datetime) -> Optional[OptimizationSchedule]:
+    def _optimize_entertainment_device(self,
+                                       device: Device,
+                                       device_data: Dict[str, Any],
+                                       weather_data: Dict[str, Any],
+                                       current_time: datetime) -> Optional[OptimizationSchedule]:
         """Optimize entertainment devices during peak hours"""
         current_hour = current_time.hour
         current_power = device_data['current_power']
@@ -477,7 +521,7 @@ class OptimizerAgent(BaseAgent):
         if current_hour in self.peak_hours and current_power > 50:
             # Suggest reducing to standby mode
             standby_power = getattr(device, 'standby_power', 15)
-            estimated_savings = (current_power - standby_power) / 1000 * self.pricing_tiers['peak']['rate_dh_kwh']
+            estimated_savings = _shift_savings_dh(current_power - standby_power, self._peak_rate)
             
             return OptimizationSchedule(
                 device_id=device.id,
@@ -492,10 +536,11 @@ class OptimizerAgent(BaseAgent):
         
         return None
     
-    async def _optimize_scheduled_device(self,
-                                       device: Device,
-                                       device_data: Dict[str, Any],
-                                       current_time: datetime) -> Optional[OptimizationSchedule]:
+    def _optimize_scheduled_device(self,
+                                   device: Device,
+                                   device_data: Dict[str, Any],
+                                   weather_data: Dict[str, Any],
+                                   current_time: datetime) -> Optional[OptimizationSchedule]:
         """Optimize schedule-based devices like lights"""
         current_hour = current_time.hour
         current_power = device_data['current_power']
@@ -504,7 +549,7 @@ class OptimizerAgent(BaseAgent):
         if device.name == "LED Lighting System" and current_hour in self.peak_hours:
             if current_power > 40:  # If lights are on full
                 dimmed_power = int(current_power * 0.6)  # Dim to 60%
-                estimated_savings = (current_power - dimmed_power) / 1000 * self.pricing_tiers['peak']['rate_dh_kwh']
+                estimated_savings = _shift_savings_dh(current_power - dimmed_power, self._peak_rate)
                 
                 return OptimizationSchedule(
                     device_id=device.id,
@@ -521,7 +566,8 @@ class OptimizerAgent(BaseAgent):
     
     async def _calculate_savings_potential(self,
                                          consumption_data: Dict[str, Any],
-                                         optimization_schedule: List[OptimizationSchedule]) -> CostAnalysis:
+                                         optimization_schedule: List[OptimizationSchedule],
+                                         current_hour: int) -> CostAnalysis:
         """Calculate potential savings from optimization schedule"""
         try:
             if not optimization_schedule:
@@ -529,8 +575,6 @@ class OptimizerAgent(BaseAgent):
             
             # Calculate current daily cost
             current_consumption = consumption_data['total_consumption']
-            current_hour = datetime.now().hour
-            current_rate = get_current_pricing_tier(current_hour)['rate']
             
             # Estimate daily cost assuming current consumption pattern
             daily_consumption_kwh = current_consumption * 24 / 1000
@@ -543,9 +587,12 @@ class OptimizerAgent(BaseAgent):
             optimized_daily_cost = current_daily_cost - total_savings
             savings_percentage = (total_savings / current_daily_cost * 100) if current_daily_cost > 0 else 0
             
-            # Calculate peak reduction potential
-            peak_devices = [opt for opt in optimization_schedule if any(h in self.peak_hours for h in range(16, 22))]
-            peak_reduction = len(peak_devices) / len(optimization_schedule) if optimization_schedule else 0
+            # Calculate peak reduction potential: every entry acts now (a delay switches off now and resumes
+            # later), so peak reductions are the non-'on' entries when the current hour is a peak hour
+            peak_reductions = 0
+            if current_hour in self.peak_hours:
+                peak_reductions = sum(1 for opt in optimization_schedule if opt.action != 'on')
+            peak_reduction = peak_reductions / len(optimization_schedule)
             
             self.logger.info(f"Calculated savings: {total_savings:.2f} DH ({savings_percentage:.1f}%)")
             
@@ -564,6 +611,25 @@ class OptimizerAgent(BaseAgent):
     
     # ===== MESSAGE HANDLERS =====
     
+    def _request_optimization(self):
+        """Request an out-of-schedule cycle, merging with one already pending in the debounce window"""
+        if self._trigger_handle is None:
+            self._trigger_handle = asyncio.get_running_loop().call_later(
+                self.trigger_debounce, self._fire_triggered_cycle
+            )
+    
+    def _fire_triggered_cycle(self):
+        """Debounce timer callback"""
+        self._trigger_handle = None
+        self._spawn(self._run_triggered_cycle())
+    
+    async def _run_triggered_cycle(self):
+        """Run a message-triggered cycle, logging failures instead of raising them into a bare task"""
+        try:
+            await self.execute_cycle()
+        except Exception as e:
+            self.logger.error(f"Triggered optimization cycle failed: {e}")
+    
     async def _handle_consumption_update(self, content: Dict[str, Any]):
         """Handle consumption update from Monitor Agent"""
         try:
@@ -573,7 +639,7 @@ class OptimizerAgent(BaseAgent):
             # If anomalies detected, trigger immediate optimization
             if anomalies and self.optimization_enabled:
                 self.logger.info(f"Anomalies detected, triggering optimization cycle")
-                await self.execute_cycle()
+                self._request_optimization()
             
             # Log consumption for learning
             await self.log_decision(
@@ -600,7 +666,7 @@ class OptimizerAgent(BaseAgent):
                 
                 if urgency == 'high' and self.optimization_enabled:
                     self.logger.info(f"High urgency weather condition, triggering optimization")
-                    await self.execute_cycle()
+                    self._request_optimization()
             
         except Exception as e:
             self.logger.error(f"Failed to handle weather update: {e}")
@@ -614,34 +680,33 @@ class OptimizerAgent(BaseAgent):
             if urgency in ['high', 'medium']:
                 self.logger.info(f"Temperature forecast requires optimization attention")
                 # Trigger optimization cycle with weather consideration
-                await self.execute_cycle()
+                self._request_optimization()
             
         except Exception as e:
             self.logger.error(f"Failed to handle temperature forecast: {e}")
     
     async def _handle_execution_result(self, content: Dict[str, Any]):
-        """Handle execution result from Controller Agent"""
+        """Handle a batch of execution results from Controller Agent"""
         try:
-            device_id = content.get('device_id')
-            success = content.get('success', False)
-            actual_savings = content.get('actual_savings', 0)
-            
-            if success:
-                self.optimization_stats['peak_reductions_achieved'] += 1
+            # Controller batches results per cycle; accept a bare result too
+            received_at = datetime.utcnow()
+            for result in content.get('results', [content]):
+                device_id = result.get('device_id')
+                success = result.get('success', False)
+                actual_savings = result.get('actual_savings', 0)
                 
-                # Learn from successful optimizations
-                self.historical_performance.append({
-                    'timestamp': datetime.utcnow(),
-                    'device_id': device_id,
-                    'success': success,
-                    'actual_savings': actual_savings
-                })
+                if success:
+                    self.optimization_stats['peak_reductions_achieved'] += 1
+                    
+                    # Learn from successful optimizations
+                    self.historical_performance.append({
+                        'timestamp': received_at,
+                        'device_id': device_id,
+                        'success': success,
+                        'actual_savings': actual_savings
+                    })
                 
-                # Keep only last 100 performance records
-                if len(self.historical_performance) > 100:
-                    self.historical_performance = self.historical_performance[-100:]
-            
-            self.logger.info(f"Optimization execution for {device_id}: {'Success' if success else 'Failed'}")
+                self.logger.info(f"Optimization execution for {device_id}: {'Success' if success else 'Failed'}")
             
         except Exception as e:
             self.logger.error(f"Failed to handle execution result: {e}")
@@ -676,11 +741,12 @@ class OptimizerAgent(BaseAgent):
     
     async def _send_optimization_to_controller(self,
                                              schedule: List[OptimizationSchedule],
-                                             savings_analysis: CostAnalysis):
+                                             savings_analysis: CostAnalysis,
+                                             now: datetime):
         """Send optimization schedule to Controller Agent"""
         try:
             schedule_data = {
-                'timestamp': datetime.utcnow().isoformat(),
+                'timestamp': now.isoformat(),
                 'optimization_schedule': [
                     {
                         'device_id': opt.device_id,
@@ -718,15 +784,16 @@ class OptimizerAgent(BaseAgent):
     
     async def _broadcast_optimization_status(self,
                                            cost_analysis: CostAnalysis,
-                                           savings_analysis: CostAnalysis):
+                                           savings_analysis: CostAnalysis,
+                                           now: datetime):
         """Broadcast optimization status to all agents"""
         try:
             status_data = {
-                'timestamp': datetime.utcnow().isoformat(),
+                'timestamp': now.isoformat(),
                 'optimization_enabled': self.optimization_enabled,
                 'current_savings_percentage': savings_analysis.savings_percentage,
                 'total_savings_dh': savings_analysis.savings_dh,
-                'optimization_stats': self.optimization_stats,
+                'optimization_stats': self._stats_snapshot(),
                 'cost_analysis': {
                     'current_cost_dh': cost_analysis.current_cost_dh,
                     'optimized_cost_dh': cost_analysis.optimized_cost_dh,
@@ -743,13 +810,20 @@ class OptimizerAgent(BaseAgent):
         except Exception as e:
             self.logger.error(f"Failed to broadcast optimization status: {e}")
     
+    def _stats_snapshot(self) -> Dict[str, Any]:
+        """Copy of optimization_stats with the timestamp pre-formatted so the payload is JSON-ready"""
+        stats = dict(self.optimization_stats)
+        if stats['last_optimization_time'] is not None:
+            stats['last_optimization_time'] = stats['last_optimization_time'].isoformat()
+        return stats
+    
     async def _send_optimizer_status(self, requesting_agent: str):
         """Send optimizer status to requesting agent"""
         try:
             status_data = {
                 'agent_name': self.agent_name,
                 'optimization_enabled': self.optimization_enabled,
-                'optimization_stats': self.optimization_stats,
+                'optimization_stats': self._stats_snapshot(),
                 'current_schedule_count': len(self.current_schedule),
                 'target_savings_percentage': self.target_savings_percentage,
                 'historical_performance_count': len(self.historical_performance),
@@ -773,30 +847,37 @@ class OptimizerAgent(BaseAgent):
                                         savings_analysis: CostAnalysis):
         """Store optimization results in database"""
         try:
-            session = self.get_db_session()
-            try:
-                result = OptimizationResult(
-                    original_cost_dh=cost_analysis.current_cost_dh,
-                    optimized_cost_dh=savings_analysis.optimized_cost_dh,
-                    savings_dh=savings_analysis.savings_dh,
-                    savings_percentage=savings_analysis.savings_percentage,
-                    total_consumption_kwh=0,  # Would calculate from actual data
-                    peak_consumption_kwh=0,   # Would calculate from actual data
-                    off_peak_consumption_kwh=0,  # Would calculate from actual data
-                    optimization_strategy="multi_agent_optimization"
-                )
-                
-                session.add(result)
-                session.commit()
-                
-                self.logger.debug(f"Stored optimization result: {savings_analysis.savings_dh:.2f} DH savings")
-                
-            finally:
-                session.close()
+            row = {
+                'original_cost_dh': cost_analysis.current_cost_dh,
+                'optimized_cost_dh': savings_analysis.optimized_cost_dh,
+                'savings_dh': savings_analysis.savings_dh,
+                'savings_percentage': savings_analysis.savings_percentage,
+                'total_consumption_kwh': 0,  # Would calculate from actual data
+                'peak_consumption_kwh': 0,   # Would calculate from actual data
+                'off_peak_consumption_kwh': 0,  # Would calculate from actual data
+                'optimization_strategy': "multi_agent_optimization"
+            }
+            
+            # Written from a worker thread so the commit never stalls the event loop
+            await asyncio.to_thread(self._sync_store_optimization_result, row)
+            
+            self.logger.debug(f"Stored optimization result: {savings_analysis.savings_dh:.2f} DH savings")
                 
         except Exception as e:
             self.logger.error(f"Failed to store optimization results: {e}")
     
+    def _sync_store_optimization_result(self, row: Dict[str, Any]):
+        """Insert one optimization result row with a Core INSERT (runs in a worker thread)"""
+        session = self.get_db_session()
+        try:
+            session.execute(insert(OptimizationResult.__table__), [row])
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
     async def _load_historical_performance(self):
         """Load historical optimization performance"""
         try:
@@ -851,4 +932,12 @@ class OptimizerAgent(BaseAgent):
             'current_schedule_count': len(self.current_schedule),
             'optimization_stats': self.optimization_stats,
             'last_optimization': self.last_optimization.isoformat() if self.last_optimization else None
-        } 
\ No newline at end of file
+        }
+    
+    # Usage pattern -> optimizer; every optimizer takes (self, device, device_data, weather_data, current_time)
+    _DEVICE_OPTIMIZERS = {
+        "temperature_dependent": _optimize_hvac_device,
+        "manual": _optimize_deferrable_device,
+        "evening_peak": _optimize_entertainment_device,
+        "schedule_based": _optimize_scheduled_device,
+    }
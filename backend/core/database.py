@@ -6,7 +6,7 @@ SQLAlchemy models for multi-agent energy optimization system
 import json
 from datetime import datetime, date
 from typing import Dict, Any, Optional, List
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, Date, Text, ForeignKey
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, Boolean, DateTime, Date, Text, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
 from sqlalchemy.types import TypeDecorator, VARCHAR
@@ -76,6 +76,11 @@ class ConsumptionLog(Base):
     temperature = Column(Float, nullable=True)  # For AC units
     efficiency_rating = Column(Float, nullable=True)  # 0.0 to 1.0
     
+    # Serves the latest-reading-per-device lookups used by the agents
+    __table_args__ = (
+        Index('ix_consumption_logs_device_timestamp', 'device_id', 'timestamp'),
+    )
+    
     # Relationships
     device = relationship("Device", back_populates="consumption_logs")
     
@@ -215,6 +220,9 @@ class DatabaseManager:
             connect_args={"check_same_thread": False}  # For SQLite
         )
         
+        if self.database_url.startswith("sqlite"):
+            event.listen(self.engine, "connect", self._configure_sqlite_connection)
+        
         self.SessionLocal = sessionmaker(
             autocommit=False,
             autoflush=False,
@@ -227,6 +235,14 @@ class DatabaseManager:
         # Initialize with default data
         self._initialize_default_data()
     
+    @staticmethod
+    def _configure_sqlite_connection(dbapi_connection, connection_record):
+        """Use WAL journaling so commits skip the per-transaction fsync of rollback journals"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+    
     def get_session(self) -> Session:
         """Get database session"""
         return self.SessionLocal()
@@ -6,7 +6,7 @@ In-memory message broker for multi-agent communication
 import asyncio
 import json
 from datetime import datetime
-from typing import Dict, Any, List, Callable, Optional, Set
+from typing import Dict, Any, List, Callable, Optional, Set, Tuple
 from dataclasses import dataclass, asdict
 from enum import Enum
 from collections import defaultdict, deque
@@ -15,6 +15,9 @@ import weakref
 
 logger = logging.getLogger(__name__)
 
+# Pub-sub topic for agent lifecycle/status changes
+AGENT_STATUS_TOPIC = "agent.status"
+
 
 class MessageType(Enum):
     """Message types for agent communication"""
@@ -38,10 +41,13 @@ class MessageType(Enum):
     DEVICE_CONTROL = "device_control"
     EXECUTION_RESULT = "execution_result"
     MANUAL_OVERRIDE = "manual_override"
+    DEVICE_STATUS = "device_status"
+    EMERGENCY_STOP = "emergency_stop"
     
     # System Messages
     AGENT_HEARTBEAT = "agent_heartbeat"
     SYSTEM_STATUS = "system_status"
+    HEALTH_CHECK = "health_check"
     ERROR_NOTIFICATION = "error_notification"
     SHUTDOWN_SIGNAL = "shutdown_signal"
 
@@ -120,6 +126,10 @@ class MessageBroker:
         # Broadcast subscribers
         self.broadcast_subscribers: Set[str] = set()
         
+        # Topic subscribers (pub-sub fan-out, callbacks receive the payload)
+        self.topic_subscribers: Dict[str, List[Callable]] = defaultdict(list)
+        self._publish_tasks: Set[asyncio.Task] = set()
+        
         # Message history for debugging
         self.message_history: deque = deque(maxlen=10000)
         
@@ -136,6 +146,12 @@ class MessageBroker:
         self._cleanup_task = None
         self._running = False
         
+        # Persistence: a single writer task drains this queue into MessageLog off the event loop
+        self._persist_queue: asyncio.Queue = asyncio.Queue(maxsize=1000)
+        self._persist_room = asyncio.Event()  # Set by the writer whenever it frees queue slots
+        self._persist_task: Optional[asyncio.Task] = None
+        self.max_persist_batch = 100  # Messages written per transaction
+        
         # Message ID counter
         self._message_counter = 0
         
@@ -152,6 +168,21 @@ class MessageBroker:
         self._running = False
         if self._cleanup_task:
             self._cleanup_task.cancel()
+        
+        # Stop the writer, then write out whatever it had not picked up
+        if self._persist_task:
+            self._persist_task.cancel()
+            try:
+                await self._persist_task
+            except asyncio.CancelledError:
+                pass
+            self._persist_task = None
+        pending = []
+        while not self._persist_queue.empty():
+            pending.append(self._persist_queue.get_nowait())
+        if pending:
+            await asyncio.to_thread(self._persist_messages_sync, pending)
+        
         logger.info("Message broker stopped")
     
     def register_agent(self, agent_name: str, agent_info: Dict[str, Any] = None) -> bool:
@@ -195,6 +226,33 @@ class MessageBroker:
             logger.error(f"Failed to unregister agent '{agent_name}': {e}")
             return False
     
+    def subscribe(self, topic: str, callback: Callable):
+        """Subscribe a callback (sync or async) to a pub-sub topic"""
+        self.topic_subscribers[topic].append(callback)
+    
+    def unsubscribe(self, topic: str, callback: Callable):
+        """Remove a callback from a pub-sub topic"""
+        if callback in self.topic_subscribers.get(topic, []):
+            self.topic_subscribers[topic].remove(callback)
+    
+    def publish(self, topic: str, payload: Dict[str, Any]) -> int:
+        """Fan out payload to all topic subscribers, returns subscriber count"""
+        subscribers = self.topic_subscribers.get(topic)
+        if not subscribers:
+            return 0
+        
+        for callback in list(subscribers):
+            try:
+                result = callback(payload)
+                if asyncio.iscoroutine(result):
+                    task = asyncio.ensure_future(result)
+                    self._publish_tasks.add(task)
+                    task.add_done_callback(self._publish_tasks.discard)
+            except Exception as e:
+                logger.error(f"Subscriber error on topic '{topic}': {e}")
+        
+        return len(subscribers)
+    
     def register_handler(self, agent_name: str, message_type: MessageType, handler: Callable):
         """Register message handler for specific message type"""
         self.agent_handlers[agent_name][message_type] = handler
@@ -208,21 +266,8 @@ class MessageBroker:
                           priority: MessagePriority = MessagePriority.MEDIUM,
                           correlation_id: Optional[str] = None) -> str:
         """Send message to another agent or broadcast"""
-        
-        # Generate unique message ID
-        self._message_counter += 1
-        message_id = f"msg_{self._message_counter}_{int(datetime.utcnow().timestamp())}"
-        
-        message = Message(
-            id=message_id,
-            type=message_type,
-            from_agent=from_agent,
-            to_agent=to_agent,
-            timestamp=datetime.utcnow(),
-            priority=priority,
-            content=content,
-            correlation_id=correlation_id
-        )
+        message = self._build_message(from_agent, to_agent, message_type, content, priority, correlation_id)
+        message_id = message.id
         
         try:
             # Handle broadcast messages
@@ -230,30 +275,26 @@ class MessageBroker:
                 delivered_count = 0
                 for subscriber in self.broadcast_subscribers:
                     if subscriber != from_agent:  # Don't send to sender
-                        await self._deliver_message(subscriber, message)
-                        delivered_count += 1
+                        if await self._deliver_message(subscriber, message):
+                            delivered_count += 1
                 
-                logger.debug(f"Broadcast message {message_id} delivered to {delivered_count} agents")
+                logger.debug("Broadcast message %s delivered to %d agents", message_id, delivered_count)
             
             # Handle direct messages
             elif to_agent in self.registered_agents:
                 await self._deliver_message(to_agent, message)
-                logger.debug(f"Message {message_id} delivered to {to_agent}")
+                logger.debug("Message %s delivered to %s", message_id, to_agent)
             
             else:
                 logger.warning(f"Agent '{to_agent}' not found for message {message_id}")
                 self.stats['messages_failed'] += 1
                 return message_id
             
-            # Store in history
-            self.message_history.append(message)
-            
-            # Update statistics
-            self.stats['messages_sent'] += 1
-            
-            # Persist message if enabled
+            # Backpressure: wait for the writer rather than drop the log entry
             if self.enable_persistence:
-                await self._persist_message(message)
+                await self._wait_for_persist_room()
+            
+            self._record_sent(message)
             
             return message_id
             
@@ -262,8 +303,109 @@ class MessageBroker:
             self.stats['messages_failed'] += 1
             raise
     
-    async def _deliver_message(self, agent_name: str, message: Message):
-        """Deliver message to specific agent"""
+    def try_send_nowait(self,
+                        from_agent: str,
+                        to_agent: str,
+                        message_type: MessageType,
+                        content: Dict[str, Any],
+                        priority: MessagePriority = MessagePriority.MEDIUM,
+                        correlation_id: Optional[str] = None) -> Optional[str]:
+        """Send message without suspending if no recipient needs an async handler.
+        
+        Returns the message ID, or None when the caller must fall back to
+        send_message() (unknown recipient, coroutine handler registered or
+        persistence queue full).
+        """
+        if self.enable_persistence and self._persist_queue.full():
+            return None
+        
+        if to_agent == "broadcast":
+            recipients = [s for s in self.broadcast_subscribers if s != from_agent]
+        elif to_agent in self.registered_agents:
+            recipients = [to_agent]
+        else:
+            return None
+        
+        for recipient in recipients:
+            handler = self.agent_handlers.get(recipient, {}).get(message_type)
+            if handler and asyncio.iscoroutinefunction(handler):
+                return None
+        
+        message = self._build_message(from_agent, to_agent, message_type, content, priority, correlation_id)
+        
+        for recipient in recipients:
+            self._deliver_message_nowait(recipient, message)
+        
+        self._record_sent(message)
+        
+        return message.id
+    
+    async def send_message_batch(self,
+                                 from_agent: str,
+                                 messages: List[Tuple[str, MessageType, Dict[str, Any], MessagePriority]]) -> List[str]:
+        """Send several (to_agent, type, content, priority) messages, awaiting only when required"""
+        message_ids = []
+        
+        for to_agent, message_type, content, priority in messages:
+            message_id = self.try_send_nowait(from_agent, to_agent, message_type, content, priority)
+            if message_id is None:
+                message_id = await self.send_message(from_agent, to_agent, message_type, content, priority)
+            message_ids.append(message_id)
+        
+        return message_ids
+    
+    def _build_message(self,
+                       from_agent: str,
+                       to_agent: str,
+                       message_type: MessageType,
+                       content: Dict[str, Any],
+                       priority: MessagePriority,
+                       correlation_id: Optional[str] = None) -> Message:
+        """Create a message with a unique ID"""
+        self._message_counter += 1
+        now = datetime.utcnow()
+        
+        return Message(
+            id=f"msg_{self._message_counter}_{int(now.timestamp())}",
+            type=message_type,
+            from_agent=from_agent,
+            to_agent=to_agent,
+            timestamp=now,
+            priority=priority,
+            content=content,
+            correlation_id=correlation_id
+        )
+    
+    def _record_sent(self, message: Message):
+        """Store a delivered message in history, count it and persist it if enabled"""
+        self.message_history.append(message)
+        self.stats['messages_sent'] += 1
+        
+        if self.enable_persistence:
+            self._persist_message(message)
+    
+    def _deliver_message_nowait(self, agent_name: str, message: Message) -> bool:
+        """Deliver message to specific agent, calling only a synchronous handler"""
+        try:
+            self.message_queues[agent_name].append(message)
+            
+            handler = self.agent_handlers.get(agent_name, {}).get(message.type)
+            if handler:
+                try:
+                    handler(message)
+                except Exception as e:
+                    logger.error(f"Handler error for {agent_name}:{message.type.value}: {e}")
+            
+            self.stats['messages_delivered'] += 1
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to deliver message to {agent_name}: {e}")
+            self.stats['messages_failed'] += 1
+            return False
+    
+    async def _deliver_message(self, agent_name: str, message: Message) -> bool:
+        """Deliver message to specific agent, returning whether it was queued"""
         try:
             # Add to agent's message queue
             self.message_queues[agent_name].append(message)
@@ -281,10 +423,12 @@ class MessageBroker:
                         logger.error(f"Handler error for {agent_name}:{message.type.value}: {e}")
             
             self.stats['messages_delivered'] += 1
+            return True
             
         except Exception as e:
             logger.error(f"Failed to deliver message to {agent_name}: {e}")
             self.stats['messages_failed'] += 1
+            return False
     
     async def receive_messages(self, agent_name: str, max_messages: int = 10) -> List[Message]:
         """Receive messages for an agent"""
@@ -381,26 +525,56 @@ class MessageBroker:
                 logger.error(f"Error in cleanup task: {e}")
                 await asyncio.sleep(10)
     
-    async def _persist_message(self, message: Message):
-        """Persist message to database for debugging"""
+    def _persist_message(self, message: Message):
+        """Queue message for the persistence writer (callers make sure the queue has room)"""
+        self._ensure_persist_writer()
+        self._persist_queue.put_nowait(message)
+    
+    async def _wait_for_persist_room(self):
+        """Suspend until the persistence queue can take another message"""
+        self._ensure_persist_writer()
+        while self._persist_queue.full():
+            self._persist_room.clear()
+            await self._persist_room.wait()
+    
+    def _ensure_persist_writer(self):
+        """Start the persistence writer on first use"""
+        if self._persist_task is None or self._persist_task.done():
+            self._persist_task = asyncio.create_task(self._message_writer())
+    
+    async def _message_writer(self):
+        """Single consumer that stores queued messages off the event loop, one transaction per batch"""
+        while True:
+            batch = [await self._persist_queue.get()]
+            while len(batch) < self.max_persist_batch and not self._persist_queue.empty():
+                batch.append(self._persist_queue.get_nowait())
+            self._persist_room.set()
+            
+            # JSON-encoding the content and the SQLite commit run in a worker thread
+            await asyncio.to_thread(self._persist_messages_sync, batch)
+    
+    def _persist_messages_sync(self, messages: List[Message]):
+        """Write message log entries to database in one transaction"""
         try:
             from .database import db_manager, MessageLog
             
             session = db_manager.get_session()
             try:
-                log_entry = MessageLog(
-                    from_agent=message.from_agent,
-                    to_agent=message.to_agent,
-                    message_type=message.type.value,
-                    content=message.content
-                )
-                session.add(log_entry)
+                session.add_all([
+                    MessageLog(
+                        from_agent=message.from_agent,
+                        to_agent=message.to_agent,
+                        message_type=message.type.value,
+                        content=message.content
+                    )
+                    for message in messages
+                ])
                 session.commit()
             finally:
                 session.close()
                 
         except Exception as e:
-            logger.error(f"Failed to persist message: {e}")
+            logger.error(f"Failed to persist {len(messages)} messages: {e}")
 
 
 # Global message broker instance
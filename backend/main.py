@@ -19,7 +19,7 @@ import sys
 # Core imports
 from core.database import init_database, get_db
 from core.config import settings
-from core.message_broker import MessageBroker
+from core.message_broker import MessageBroker, message_broker
 
 # API endpoints
 from api.energy_endpoints import router as energy_router
@@ -52,6 +52,9 @@ async def lifespan(app: FastAPI):
     init_database()
     logging.info("✅ Database initialized")
     
+    # Start the message broker's background tasks
+    await message_broker.start()
+    
     # Initialize agents
     await initialize_agents()
     logging.info("✅ All agents initialized and running")
@@ -70,6 +73,9 @@ async def lifespan(app: FastAPI):
     logging.info("🛑 Shutting down EcoSmart AI Multi-Agent System...")
     await shutdown_agents()
     logging.info("✅ All agents shut down gracefully")
+    
+    # Stop the broker last so messages sent during agent cleanup are still persisted
+    await message_broker.stop()
 
 
 # FastAPI app with lifespan manager
@@ -296,8 +302,8 @@ async def get_optimization_schedule():
         if not controller:
             raise HTTPException(status_code=404, detail="Controller agent not available")
         
-        pending_commands = getattr(controller, 'pending_commands', [])
-        scheduled_commands = getattr(controller, 'scheduled_commands', [])
+        pending_commands = controller.get_pending_commands()
+        scheduled_commands = controller.get_scheduled_commands()
         
         def serialize_command(cmd):
             return {